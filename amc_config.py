@@ -1,10 +1,28 @@
 """
 AMC configuration — mapping of AMC names to AMFI IDs.
 Top 10 AMCs by equity + hybrid AUM are flagged for dashboard focus.
+
+The lookup tables are read-only views; build a new dict if you need to edit one.
 """
 
+import re
+import sys
+from functools import lru_cache
+from types import MappingProxyType
+from typing import NamedTuple
+
+import numpy as np
+
+__all__ = (
+    "ALL_AMCS", "TOP_AMCS", "TOP_AMCS_ORDERED", "SHORT_NAMES",
+    "AMC_NAME_TO_ID", "AMC_BY_CASEFOLD",
+    "AMC_CODE_DTYPE", "AMC_CODES", "AMC_IDS", "AMC_NAMES", "AMC_SHORTS", "AMC_IS_TOP",
+    "TOP_AMC_MASK", "AMCRecord", "AMCS",
+    "short_name", "amfi_id", "amc_name", "lookup_amc", "encode_amc", "decode_amc",
+)
+
 # Full AMC list (from AMFI fundperformancefilters endpoint, Feb 2026)
-ALL_AMCS = {
+_AMC_NAMES = {
     1: "360 ONE MF",
     2: "Aditya Birla Sun Life MF",
     3: "Angel One MF",
@@ -52,7 +70,7 @@ ALL_AMCS = {
 }
 
 # Top AMCs to highlight in the dashboard (will be refined with actual AUM data)
-TOP_AMCS = [
+_TOP_AMCS = (
     "SBI MF",
     "HDFC MF",
     "ICICI Prudential MF",
@@ -65,10 +83,10 @@ TOP_AMCS = [
     "Tata MF",
     "Motilal Oswal MF",
     "Aditya Birla Sun Life MF",
-]
+)
 
 # Short display names for charts
-SHORT_NAMES = {
+_SHORT_NAMES = {
     "360 ONE MF": "360 ONE",
     "Aditya Birla Sun Life MF": "ABSL",
     "Axis MF": "Axis",
@@ -97,7 +115,112 @@ SHORT_NAMES = {
     "WhiteOak Capital MF": "WhiteOak",
 }
 
+# Public tables. Names are interned so dict lookups and `==` checks against
+# them short-circuit on identity.
+ALL_AMCS = MappingProxyType({k: sys.intern(v) for k, v in _AMC_NAMES.items()})
+SHORT_NAMES = MappingProxyType({
+    sys.intern(k): sys.intern(v) for k, v in _SHORT_NAMES.items()
+})
+TOP_AMCS_ORDERED = tuple(sys.intern(n) for n in _TOP_AMCS)
+
+# Membership set for filters (`name in TOP_AMCS`)
+TOP_AMCS = frozenset(TOP_AMCS_ORDERED)
+
+# Reverse index: AMC name -> AMFI ID
+AMC_NAME_TO_ID = MappingProxyType({v: k for k, v in ALL_AMCS.items()})
+
+# AMC name by AMFI ID as a flat tuple (None for unused IDs)
+_AMC_BY_ID = tuple(ALL_AMCS.get(i) for i in range(max(ALL_AMCS) + 1))
+
+# Case-insensitive index: casefolded AMC name -> (AMFI ID, AMC name)
+AMC_BY_CASEFOLD = MappingProxyType({
+    sys.intern(name.casefold()): (amc_id, name) for amc_id, name in ALL_AMCS.items()
+})
+
+# Dense integer codes (0..n-1) for AMC names, for compact join / group keys
+AMC_CODE_DTYPE = "int16"
+AMC_NAMES = tuple(ALL_AMCS.values())
+AMC_CODES = MappingProxyType({name: i for i, name in enumerate(AMC_NAMES)})
+
+
+_SUFFIX_RE = re.compile(r"\s+(?:Mutual Fund|MF)$")
+
+
+@lru_cache(maxsize=128)
+def _strip_suffix(amc_name: str) -> str:
+    """Fallback short name: drop the trailing 'Mutual Fund' / 'MF' suffix."""
+    return _SUFFIX_RE.sub("", amc_name)
+
+
+# Short name for every known AMC, resolved once at import
+_SHORT_NAME_TABLE = MappingProxyType({
+    name: SHORT_NAMES.get(name, _strip_suffix(name)) for name in ALL_AMCS.values()
+})
+
+# Struct-of-arrays view of the AMC list: row i (the AMC with code i) is
+# AMC_IDS[i], AMC_NAMES[i], AMC_SHORTS[i], AMC_IS_TOP[i].
+AMC_IDS = tuple(ALL_AMCS.keys())
+AMC_SHORTS = tuple(_SHORT_NAME_TABLE[name] for name in AMC_NAMES)
+AMC_IS_TOP = tuple(name in TOP_AMCS for name in AMC_NAMES)
+
+
+class AMCRecord(NamedTuple):
+    """One AMC with all of its attributes."""
+    amfi_id: int
+    name: str
+    short: str
+    is_top: bool
+
+
+# Array-of-records view, for callers that need every field of each AMC
+AMCS = tuple(map(AMCRecord, AMC_IDS, AMC_NAMES, AMC_SHORTS, AMC_IS_TOP))
+
+# Boolean mask indexed by AMFI ID, for vectorised "top AMC" filters:
+#   df[TOP_AMC_MASK[df["amfi_id"].to_numpy()]]
+TOP_AMC_MASK = np.zeros(max(ALL_AMCS) + 1, dtype=bool)
+TOP_AMC_MASK[[AMC_NAME_TO_ID[name] for name in TOP_AMCS_ORDERED]] = True
+TOP_AMC_MASK.flags.writeable = False
+
+
+# Every override / highlighted AMC must be a known AMC, so that short_name()
+# resolves all of them from the table above and never hits the fallback.
+assert SHORT_NAMES.keys() <= _SHORT_NAME_TABLE.keys(), "SHORT_NAMES has unknown AMCs"
+assert TOP_AMCS <= _SHORT_NAME_TABLE.keys(), "TOP_AMCS has unknown AMCs"
+
+_short_name_get = _SHORT_NAME_TABLE.get
+
 
 def short_name(amc_name: str) -> str:
     """Return short display name for an AMC."""
-    return SHORT_NAMES.get(amc_name, amc_name.replace(" Mutual Fund", "").replace(" MF", ""))
+    short = _short_name_get(amc_name)
+    if short is None:
+        short = _strip_suffix(amc_name)
+    return short
+
+
+def amfi_id(amc_name: str) -> int:
+    """Return the AMFI ID for a full AMC name (e.g. 'HDFC MF' -> 14)."""
+    return AMC_NAME_TO_ID[amc_name]
+
+
+def amc_name(amc_id: int):
+    """Return the full AMC name for an AMFI ID, or None if the ID is unused."""
+    return _AMC_BY_ID[amc_id] if 0 <= amc_id < len(_AMC_BY_ID) else None
+
+
+def lookup_amc(user_input: str):
+    """
+    Case-insensitive AMC lookup for free-text input (e.g. ' hdfc mf ').
+    Returns (amfi_id, amc_name), or None if the name is not known.
+    """
+    return AMC_BY_CASEFOLD.get(user_input.strip().casefold())
+
+
+def encode_amc(amc_name: str) -> int:
+    """Return the dense integer code for a full AMC name."""
+    return AMC_CODES[amc_name]
+
+
+def decode_amc(code: int) -> str:
+    """Return the full AMC name for a code from encode_amc()."""
+    return AMC_NAMES[code]
@@ -7,13 +7,12 @@ Time-series first approach with period aggregation (Monthly/Quarterly/FY/FY YTD)
 Launch: streamlit run app.py --server.port 8501
 """
 
-import os, sqlite3, numpy as np, pandas as pd
+import io, os, sqlite3, numpy as np, pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import date
-from dateutil.relativedelta import relativedelta
 
 # ── Page config ────────────────────────────────────────────────────────────────
 st.set_page_config(
@@ -59,6 +58,7 @@ AXIS_STYLE = dict(gridcolor="#e5e7eb", linecolor="#d1d5db")
 COLOR_POS = "#16a34a"
 COLOR_NEG = "#dc2626"
 COLOR_AUM = "#2563eb"
+MAX_BAR_LABELS = 24  # above this many bars, values are shown on hover only
 
 
 # ── Period helpers ───────────────────────────────────────────────────────────
@@ -89,49 +89,54 @@ def get_current_fy():
     return f"FY{t.year % 100:02d}"
 
 
-def add_period_cols(df):
-    df = df.copy()
-    df["fy"] = df["month_end"].apply(assign_fy)
-    df["quarter"] = df["month_end"].apply(assign_quarter)
-    df["month_lbl"] = df["month_end"].dt.strftime("%b '%y")
-    return df
+# Fiscal quarter by calendar month (index 1-12); Apr-Jun is Q1
+QUARTER_OF_MONTH = np.array(["", "Q4", "Q4", "Q4", "Q1", "Q1", "Q1",
+                             "Q2", "Q2", "Q2", "Q3", "Q3", "Q3"])
 
 
-def agg_by_period(df, period, extra_group=None):
-    """
-    Aggregate monthly data to selected period granularity.
-    Two-step: (1) sum schemes → monthly totals, (2) aggregate months → period.
-    """
-    if extra_group is None:
-        extra_group = []
-    df = df.sort_values("month_end").copy()
+def add_period_cols(df):
+    """Vectorised equivalent of assign_fy / assign_quarter over month_end."""
+    month = df["month_end"].dt.month.to_numpy()
+    fy_year = df["month_end"].dt.year.to_numpy() + (month >= 4)
+    fy = np.char.add("FY", np.char.zfill((fy_year % 100).astype("U2"), 2))
+    return df.assign(
+        fy=fy,
+        quarter=np.char.add(np.char.add(QUARTER_OF_MONTH[month], " "), fy),
+        month_lbl=df["month_end"].dt.strftime("%b '%y").astype("category"),
+    )
+
 
+def with_period(df, period):
+    """Add the _period label for the selected granularity (FY YTD also filters)."""
     if period == "Monthly":
-        df["_period"] = df["month_lbl"]
-    elif period == "Quarterly":
-        df["_period"] = df["quarter"]
-    elif period == "Financial Year":
-        df["_period"] = df["fy"]
-    elif period == "FY YTD":
-        cfy = get_current_fy()
-        df = df[df["fy"] == cfy]
-        df["_period"] = df["month_lbl"]
+        return df.assign(_period=df["month_lbl"])
+    if period == "Quarterly":
+        return df.assign(_period=df["quarter"])
+    if period == "Financial Year":
+        return df.assign(_period=df["fy"])
+    if period == "FY YTD":
+        df = df[df["fy"] == get_current_fy()]
+        return df.assign(_period=df["month_lbl"])
+    return df
 
-    if df.empty:
-        return pd.DataFrame()
 
-    # Step 1: Sum scheme-level data to monthly totals (per extra_group)
-    monthly_grp = extra_group + ["_period", "month_end"]
-    monthly = df.groupby(monthly_grp, sort=False).agg(
+def sum_to_months(df, extra_group):
+    """Step 1: sum scheme-level rows to monthly totals (per extra_group)."""
+    return df.groupby(extra_group + ["_period", "month_end"], sort=False,
+                      observed=True).agg(
         net_flow_cr=("net_flow_cr", "sum"),
         aum_cr=("aum_cur_cr", "sum"),
     ).reset_index().sort_values("month_end")
 
-    # Step 2: Aggregate monthly totals to period level
-    #   Flows: SUM across months in the period
-    #   AUM: last month's total (end-of-period AUM)
+
+def months_to_periods(monthly, extra_group):
+    """
+    Step 2: aggregate monthly totals to period level.
+      Flows: SUM across months in the period
+      AUM: last month's total (end-of-period AUM)
+    """
     grp = extra_group + ["_period"]
-    agg = monthly.groupby(grp, sort=False).agg(
+    agg = monthly.groupby(grp, sort=False, observed=True).agg(
         net_flow_cr=("net_flow_cr", "sum"),
         aum_cr=("aum_cr", "last"),
         period_sort=("month_end", "max"),
@@ -144,6 +149,20 @@ def agg_by_period(df, period, extra_group=None):
     return agg.sort_values("period_sort")
 
 
+def agg_by_period(df, period, extra_group=None):
+    """
+    Aggregate monthly data to selected period granularity.
+    Two-step: (1) sum schemes → monthly totals, (2) aggregate months → period.
+    Expects df sorted by month_end (load_data does this once).
+    """
+    if extra_group is None:
+        extra_group = []
+    df = with_period(df, period)
+    if df.empty:
+        return pd.DataFrame()
+    return months_to_periods(sum_to_months(df, extra_group), extra_group)
+
+
 # ── Helpers ──────────────────────────────────────────────────────────────────
 def fmt_cr(val):
     if pd.isna(val):
@@ -155,6 +174,47 @@ def fmt_cr(val):
     return f"\u20b9{val:,.0f} Cr"
 
 
+def fmt_cr_vec(values):
+    """Array version of fmt_cr for chart labels (returns a numpy str array)."""
+    a = np.asarray(values, dtype=np.float64)
+    absa = np.abs(a)
+    big, mid = absa >= 1e5, absa >= 1e3
+    scale = np.where(big, 1e5, np.where(mid, 1e3, 1.0))
+    suffix = np.where(big, "L Cr", np.where(mid, "K Cr", " Cr"))
+    body = np.char.mod(np.where(mid, "%.1f", "%.0f"), a / scale)
+    out = np.char.add(np.char.add("\u20b9", body), suffix)
+    return np.where(np.isnan(a), "\u2014", out)
+
+
+def sign_colors(values):
+    """COLOR_POS / COLOR_NEG per value, as a numpy array for marker_color."""
+    return np.where(np.asarray(values, dtype=np.float64) >= 0, COLOR_POS, COLOR_NEG)
+
+
+def top_k(df, col, k, largest=True):
+    """nlargest/nsmallest via np.argpartition (O(n)); NaNs never make the cut."""
+    a = df[col].to_numpy(dtype=np.float64)
+    key = np.where(np.isnan(a), -np.inf, -a) if largest else np.where(np.isnan(a), np.inf, a)
+    k = min(k, int(np.isfinite(key).sum()))
+    if k == 0:
+        return df.iloc[:0]
+    idx = np.argpartition(key, k - 1)[:k]
+    return df.iloc[idx[np.argsort(key[idx], kind="stable")]]
+
+
+@st.cache_data(ttl=3600)
+def raw_csv_bytes(show_df):
+    """Tab 4 CSV export, with NAV Return / Flow % written as formatted text."""
+    nav_ret = show_df["NAV Return"].to_numpy(dtype=np.float64)
+    flow_pct = show_df["Flow %"].to_numpy(dtype=np.float64)
+    buf = io.BytesIO()
+    show_df.assign(**{
+        "NAV Return": np.where(np.isnan(nav_ret), None, np.char.mod("%.4f", nav_ret)),
+        "Flow %": np.where(np.isnan(flow_pct), None, np.char.mod("%+.2f%%", flow_pct)),
+    }).to_csv(buf, index=False, encoding="utf-8")
+    return buf.getvalue()
+
+
 def kpi(label, value, sub="", css_class=""):
     return f"""<div class='kpi-card'>
         <div class='kpi-label'>{label}</div>
@@ -165,24 +225,265 @@ def kpi(label, value, sub="", css_class=""):
 
 def db_exists():
     try:
-        con = sqlite3.connect(DB_PATH)
-        c = con.execute("SELECT COUNT(*) FROM monthly_flows").fetchone()[0]
-        con.close()
-        return c > 0
+        return _conn().execute(
+            "SELECT 1 FROM monthly_flows LIMIT 1").fetchone() is not None
     except Exception:
         return False
 
 
+@st.cache_resource
+def _conn():
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    con.executescript("""
+        PRAGMA query_only = 1;
+        PRAGMA mmap_size = 268435456;
+        PRAGMA cache_size = -65536;
+    """)
+    return con
+
+
+def db_mtime():
+    """Last write to the database file (or its WAL), 0.0 if neither exists."""
+    paths = (DB_PATH, DB_PATH + "-wal")
+    return max((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=0.0)
+
+
+@st.cache_resource
+def _seen_db_mtime():
+    return {}
+
+
+def drop_cache_if_db_changed():
+    """
+    Clear st.cache_data when the database has been written since it was last
+    read, e.g. by the scheduler in another process, instead of waiting out
+    the TTL. Every cached loader / aggregate derives from the database.
+    """
+    seen, mtime = _seen_db_mtime(), db_mtime()
+    if seen.get("mtime", mtime) != mtime:
+        st.cache_data.clear()
+    seen["mtime"] = mtime
+
+
+@st.cache_data(ttl=3600)
+def load_pipeline_log():
+    return pl.load_pipeline_log()
+
+
+# Columns the dashboard reads (prev_month_end is never shown).
+FLOWS_QUERY = """
+    SELECT month_end, scheme_name, category, sub_category,
+           aum_cur_cr, aum_prev_cr, nav_cur, nav_prev, nav_return,
+           net_flow_cr, expected_aum_cr, flow_pct
+    FROM monthly_flows
+    WHERE month_end >= date('now', ?)
+    ORDER BY month_end DESC
+"""
+CATEGORY_COLS = {c: "category" for c in ("scheme_name", "category", "sub_category")}
+
+
 @st.cache_data(ttl=3600)
-def load_data():
-    df = pl.load_flows(months=36)
+def load_data(months=36):
+    df = pd.read_sql_query(
+        FLOWS_QUERY, _conn(), params=(f"-{months} months",),
+        parse_dates=["month_end"], dtype=CATEGORY_COLS,
+    )
     if df.empty:
         return df
-    df["month_end"] = pd.to_datetime(df["month_end"])
+    df = df.sort_values("month_end", kind="stable", ignore_index=True)
     df = add_period_cols(df)
     return df
 
 
+@st.cache_data(ttl=3600)
+def build_period_frames(period, categories):
+    """
+    Period aggregates for the given category filter, as (totals, by_subcat).
+    The scheme → month groupby runs once per sub-category; the totals are
+    rolled up from those monthly sub-category sums.
+    """
+    data = load_data()
+    data = with_period(data[data["category"].isin(categories)], period)
+    if data.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    monthly_sub = sum_to_months(data, ["sub_category"])
+    monthly = monthly_sub.groupby(["_period", "month_end"], sort=False, observed=True).agg(
+        net_flow_cr=("net_flow_cr", "sum"),
+        aum_cr=("aum_cr", "sum"),
+    ).reset_index().sort_values("month_end")
+    return (months_to_periods(monthly, []),
+            months_to_periods(monthly_sub, ["sub_category"]))
+
+
+@st.cache_data(ttl=3600)
+def scheme_period_agg(scheme, period):
+    """agg_by_period for one scheme, cached on (scheme, period) rather than a hashed frame."""
+    data = load_data()
+    return agg_by_period(data[data["scheme_name"] == scheme], period)
+
+
+def with_period_order(agg):
+    """Order period_label chronologically (by period_sort) for pivot_table."""
+    order = agg.sort_values("period_sort", kind="stable")["period_label"].unique()
+    return agg.assign(period_label=pd.Categorical(
+        agg["period_label"], categories=order, ordered=True))
+
+
+# ── Cached period figures ───────────────────────────────────────────────────
+# Built from build_period_frames, so they share its TTL and are dropped with it
+# by st.cache_data.clear(); (period, categories) is the whole cache key.
+@st.cache_data(ttl=3600)
+def flow_trend_figure(period, categories):
+    """Net flow bars + flow/AUM % line, as a plotly JSON dict."""
+    monthly, _ = build_period_frames(period, categories)
+    fig_flow = make_subplots(specs=[[{"secondary_y": True}]])
+    flow_colors = sign_colors(monthly["net_flow_cr"])
+    flow_labels = (fmt_cr_vec(monthly["net_flow_cr"])
+                   if len(monthly) <= MAX_BAR_LABELS else None)
+
+    fig_flow.add_trace(go.Bar(
+        x=monthly["period_label"], y=monthly["net_flow_cr"],
+        name="Net Flow", marker_color=flow_colors, opacity=0.85,
+        text=flow_labels, textposition="outside", textfont=dict(size=11),
+        hovertemplate="Net Flow: \u20b9%{y:,.0f} Cr<extra></extra>",
+    ), secondary_y=False)
+
+    fig_flow.add_trace(go.Scatter(
+        x=monthly["period_label"], y=monthly["flow_pct"],
+        name="Flow / AUM %", line=dict(color="#7c3aed", width=2.5),
+        mode="lines+markers", marker=dict(size=6),
+        hovertemplate="Flow/AUM: %{y:+.1f}%<extra></extra>",
+    ), secondary_y=True)
+
+    fig_flow.update_layout(
+        height=460, barmode="relative",
+        legend=dict(orientation="h", y=1.08, font=dict(size=12)),
+        **CHART_THEME, hovermode="x",
+        xaxis=dict(**AXIS_STYLE, tickfont=dict(size=12)),
+        yaxis=dict(title="Net Flow (\u20b9 Cr)", zeroline=True,
+                   zerolinecolor="#d1d5db", **AXIS_STYLE),
+        yaxis2=dict(title="Flow / AUM (%)", gridcolor="rgba(0,0,0,0)",
+                    ticksuffix="%", zeroline=True, zerolinecolor="#d1d5db"),
+    )
+    return fig_flow.to_plotly_json()
+
+
+@st.cache_data(ttl=3600)
+def aum_trend_figure(period, categories):
+    """AUM bars + YoY growth % line, as a plotly JSON dict."""
+    monthly, _ = build_period_frames(period, categories)
+    aum_data = monthly.reset_index(drop=True)
+    aum_labels = (fmt_cr_vec(aum_data["aum_cr"])
+                  if len(aum_data) <= MAX_BAR_LABELS else None)
+
+    # Compute YoY: match each period to the one ~12 months earlier (±45 days)
+    prev_year = pd.DataFrame({
+        "period_sort": aum_data["period_sort"] + pd.DateOffset(years=1),
+        "aum_prev": aum_data["aum_cr"],
+    })
+    aum_prev = pd.merge_asof(
+        aum_data[["period_sort"]], prev_year, on="period_sort",
+        direction="nearest", tolerance=pd.Timedelta(days=45),
+    )["aum_prev"]
+    aum_data["yoy_pct"] = np.where(
+        aum_prev > 0, (aum_data["aum_cr"] - aum_prev) / aum_prev * 100, np.nan
+    )
+
+    fig_aum = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_aum.add_trace(go.Bar(
+        x=aum_data["period_label"], y=aum_data["aum_cr"],
+        name="AUM", marker_color=COLOR_AUM, opacity=0.85,
+        text=aum_labels, textposition="outside", textfont=dict(size=11),
+        hovertemplate="AUM: \u20b9%{y:,.0f} Cr<extra></extra>",
+    ), secondary_y=False)
+
+    fig_aum.add_trace(go.Scatter(
+        x=aum_data["period_label"], y=aum_data["yoy_pct"],
+        name="YoY AUM Growth %", line=dict(color="#f59e0b", width=2.5),
+        mode="lines+markers", marker=dict(size=6), connectgaps=True,
+        hovertemplate="YoY: %{y:+.1f}%<extra></extra>",
+    ), secondary_y=True)
+
+    fig_aum.update_layout(
+        height=460, barmode="relative",
+        legend=dict(orientation="h", y=1.08, font=dict(size=12)),
+        **CHART_THEME, hovermode="x",
+        xaxis=dict(**AXIS_STYLE, tickfont=dict(size=12)),
+        yaxis=dict(title="AUM (\u20b9 Cr)", **AXIS_STYLE),
+        yaxis2=dict(title="YoY Growth (%)", gridcolor="rgba(0,0,0,0)",
+                    ticksuffix="%"),
+    )
+    return fig_aum.to_plotly_json()
+
+
+@st.cache_data(ttl=3600)
+def subcat_flow_figure(period, categories):
+    """Stacked net flow by sub-category (top 10), as a plotly JSON dict."""
+    _, cat_agg = build_period_frames(period, categories)
+    cat_pivot = with_period_order(cat_agg).pivot_table(
+        index="period_label", columns="sub_category",
+        values="net_flow_cr", aggfunc="sum", fill_value=0, observed=True
+    )
+
+    # Limit to top 10 categories by total absolute flow
+    col_tot = -np.abs(cat_pivot.to_numpy()).sum(axis=0)
+    k = min(10, col_tot.size)
+    top_idx = np.argpartition(col_tot, k - 1)[:k]
+    cat_pivot = cat_pivot.iloc[:, top_idx[np.argsort(col_tot[top_idx], kind="stable")]]
+
+    palette = px.colors.qualitative.Set2
+    fig2 = go.Figure()
+    for i, col in enumerate(cat_pivot.columns):
+        fig2.add_trace(go.Bar(
+            x=cat_pivot.index, y=cat_pivot[col], name=col,
+            marker_color=palette[i % len(palette)],
+            hovertemplate=f"<b>{col}</b>: " + "\u20b9%{y:,.0f} Cr<extra></extra>",
+        ))
+    fig2.update_layout(
+        barmode="relative", height=440,
+        **CHART_THEME, hovermode="x",
+        legend=dict(orientation="h", y=-0.25, font=dict(size=11), traceorder="normal"),
+        xaxis=dict(title="", tickfont=dict(size=12), **AXIS_STYLE),
+        yaxis=dict(title="Net Flow (\u20b9 Cr)", **AXIS_STYLE),
+    )
+    return fig2.to_plotly_json()
+
+
+@st.cache_data(ttl=3600)
+def subcat_heatmap_figure(period, categories):
+    """Sub-category × period flow heatmap as a plotly JSON dict (None if empty)."""
+    _, cat_hm = build_period_frames(period, categories)
+    hm_pivot = with_period_order(cat_hm).pivot_table(
+        index="sub_category", columns="period_label",
+        values="net_flow_cr", aggfunc="sum", fill_value=0, observed=True
+    )
+
+    if hm_pivot.empty:
+        return None
+    fig7 = go.Figure(data=go.Heatmap(
+        z=hm_pivot.values,
+        x=hm_pivot.columns.tolist(),
+        y=hm_pivot.index.tolist(),
+        colorscale=[
+            [0.0, "#dc2626"], [0.4, "#fecaca"],
+            [0.5, "#f3f4f6"], [0.6, "#bbf7d0"], [1.0, "#16a34a"],
+        ],
+        zmid=0,
+        text=fmt_cr_vec(hm_pivot.values),
+        texttemplate="%{text}",
+        textfont=dict(size=10, color="#1f2937"),
+        hovertemplate="<b>%{y}</b><br>%{x}: %{text}<extra></extra>",
+        colorbar=dict(title="\u20b9 Cr", tickfont=dict(size=11)),
+    ))
+    fig7.update_layout(
+        height=max(350, len(hm_pivot) * 48),
+        **CHART_THEME,
+        xaxis=dict(side="top", tickfont=dict(size=12)),
+        yaxis=dict(autorange="reversed", tickfont=dict(size=11)),
+    )
+    return fig7.to_plotly_json()
+
+
 # ── Sidebar ──────────────────────────────────────────────────────────────────
 with st.sidebar:
     st.markdown("## \U0001f4ca ICICI Pru MF Flows")
@@ -193,6 +494,9 @@ with st.sidebar:
     # Show fetch controls only when running locally (not on Streamlit Cloud)
     _is_cloud = os.environ.get("STREAMLIT_SHARING") or os.environ.get("STREAMLIT_SERVER_HEADLESS")
     if not _is_cloud:
+        # Only the local fetch controls need this; skip it on Cloud.
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
         st.markdown("### \U0001f4e5 Fetch New Data")
         st.caption("Select a month to fetch from AMFI and compute flows.")
         col_y, col_m = st.columns(2)
@@ -215,27 +519,27 @@ with st.sidebar:
             st.caption("Fetch data for several past months at once.")
             hist_months = st.number_input("Months to go back", min_value=1, max_value=24, value=6)
 
-            preview_list = []
-            for i in range(hist_months, -1, -1):
-                dt = date(sel_year, sel_month, 1) - relativedelta(months=i)
-                preview_list.append(f"{pl.MONTH_ABBR[dt.month]} {dt.year}")
+            hist_dts = pd.date_range(end=pd.Timestamp(sel_year, sel_month, 1),
+                                     periods=hist_months + 1, freq="MS")
+            preview_list = [f"{pl.MONTH_ABBR[d.month]} {d.year}" for d in hist_dts]
             st.info(f"Will fetch: **{preview_list[0]}** to **{preview_list[-1]}** ({len(preview_list)} months)")
 
             if st.button("\U0001f504 Load Historical Data", use_container_width=True):
-                import time
                 progress = st.progress(0)
-                months_list = []
-                for i in range(hist_months, -1, -1):
-                    dt = date(sel_year, sel_month, 1) - relativedelta(months=i)
-                    months_list.append((dt.year, dt.month))
-                for idx, (yr, mn) in enumerate(months_list):
-                    st.text(f"Processing {pl.MONTH_ABBR[mn]} {yr}...")
-                    try:
-                        pl.compute_flows_for_month(yr, mn)
-                    except Exception as e:
-                        st.warning(f"Error for {pl.MONTH_ABBR[mn]} {yr}: {e}")
-                    progress.progress((idx + 1) / len(months_list))
-                    time.sleep(0.5)
+                months_list = [(d.year, d.month) for d in hist_dts]
+                # Months are independent (each fetches its own prior month-end),
+                # so fetch a few at once; Streamlit calls stay on this thread.
+                with ThreadPoolExecutor(max_workers=pl.MONTH_WORKERS) as ex:
+                    futures = {ex.submit(pl.compute_flows_for_month, yr, mn): (yr, mn)
+                               for yr, mn in months_list}
+                    for idx, fut in enumerate(as_completed(futures)):
+                        yr, mn = futures[fut]
+                        try:
+                            fut.result()
+                            st.text(f"Processed {pl.MONTH_ABBR[mn]} {yr}")
+                        except Exception as e:
+                            st.warning(f"Error for {pl.MONTH_ABBR[mn]} {yr}: {e}")
+                        progress.progress((idx + 1) / len(months_list))
                 st.cache_data.clear()
                 st.success(f"Loaded {len(months_list)} months!")
 
@@ -266,12 +570,14 @@ if not db_exists():
     """)
     st.stop()
 
+drop_cache_if_db_changed()
 df = load_data()
 if df.empty:
     st.warning("No data available. Try fetching data using the sidebar.")
     st.stop()
 
 df = df[df["category"].isin(category_filter)]
+categories = tuple(category_filter)
 if df.empty:
     st.warning("No data matches your filters.")
     st.stop()
@@ -297,11 +603,12 @@ fy_ytd_months = df_fy_ytd["month_end"].nunique()
 
 # Latest month stats
 df_latest = df[df["month_end"] == latest_month]
-total_flow = df_latest["net_flow_cr"].sum()
-total_aum = df_latest["aum_cur_cr"].sum()
+latest_flows = df_latest["net_flow_cr"].to_numpy(dtype=np.float64)
+total_flow = np.nansum(latest_flows)
+total_aum = np.nansum(df_latest["aum_cur_cr"].to_numpy(dtype=np.float64))
 num_schemes = df_latest["scheme_name"].nunique()
-inflow_schemes = (df_latest["net_flow_cr"] > 0).sum()
-outflow_schemes = (df_latest["net_flow_cr"] < 0).sum()
+inflow_schemes = np.count_nonzero(latest_flows > 0)
+outflow_schemes = np.count_nonzero(latest_flows < 0)
 flow_pct = (total_flow / total_aum * 100) if total_aum else 0
 
 
@@ -352,7 +659,7 @@ tab1, tab2, tab3, tab5, tab4 = st.tabs([
 # ═══════════════════════════════════════════════════════════════════════
 with tab1:
     # Aggregate to selected period
-    monthly = agg_by_period(df, period)
+    monthly, cat_agg = build_period_frames(period, categories)
 
     if monthly.empty:
         st.warning("No data for selected period.")
@@ -362,87 +669,14 @@ with tab1:
             "<div class='section-header'>Net Inflows / Outflows</div>",
             unsafe_allow_html=True,
         )
-
-        fig_flow = make_subplots(specs=[[{"secondary_y": True}]])
-        flow_colors = [COLOR_POS if v >= 0 else COLOR_NEG for v in monthly["net_flow_cr"]]
-        flow_labels = [fmt_cr(v) for v in monthly["net_flow_cr"]]
-
-        fig_flow.add_trace(go.Bar(
-            x=monthly["period_label"], y=monthly["net_flow_cr"],
-            name="Net Flow", marker_color=flow_colors, opacity=0.85,
-            text=flow_labels, textposition="outside", textfont=dict(size=11),
-            hovertemplate="Net Flow: \u20b9%{y:,.0f} Cr<extra></extra>",
-        ), secondary_y=False)
-
-        fig_flow.add_trace(go.Scatter(
-            x=monthly["period_label"], y=monthly["flow_pct"],
-            name="Flow / AUM %", line=dict(color="#7c3aed", width=2.5),
-            mode="lines+markers", marker=dict(size=6),
-            hovertemplate="Flow/AUM: %{y:+.1f}%<extra></extra>",
-        ), secondary_y=True)
-
-        fig_flow.update_layout(
-            height=460, barmode="relative",
-            legend=dict(orientation="h", y=1.08, font=dict(size=12)),
-            **CHART_THEME, hovermode="x",
-            xaxis=dict(**AXIS_STYLE, tickfont=dict(size=12)),
-            yaxis=dict(title="Net Flow (\u20b9 Cr)", zeroline=True,
-                       zerolinecolor="#d1d5db", **AXIS_STYLE),
-            yaxis2=dict(title="Flow / AUM (%)", gridcolor="rgba(0,0,0,0)",
-                        ticksuffix="%", zeroline=True, zerolinecolor="#d1d5db"),
-        )
-        st.plotly_chart(fig_flow, use_container_width=True)
+        st.plotly_chart(flow_trend_figure(period, categories), use_container_width=True)
 
         # ── Chart 2: AUM bars + YoY Growth % ──────────────────────
         st.markdown(
             "<div class='section-header'>Total AUM & YoY Growth</div>",
             unsafe_allow_html=True,
         )
-
-        aum_data = monthly.copy().reset_index(drop=True)
-        aum_labels = [fmt_cr(v) for v in aum_data["aum_cr"]]
-
-        # Compute YoY
-        yoy = []
-        for i, row in aum_data.iterrows():
-            target = row["period_sort"] - pd.DateOffset(years=1)
-            prev = aum_data[aum_data["period_sort"].between(
-                target - pd.Timedelta(days=45), target + pd.Timedelta(days=45)
-            )]
-            if not prev.empty and prev.iloc[0]["aum_cr"] > 0:
-                yoy.append(
-                    (row["aum_cr"] - prev.iloc[0]["aum_cr"])
-                    / prev.iloc[0]["aum_cr"] * 100
-                )
-            else:
-                yoy.append(None)
-        aum_data["yoy_pct"] = yoy
-
-        fig_aum = make_subplots(specs=[[{"secondary_y": True}]])
-        fig_aum.add_trace(go.Bar(
-            x=aum_data["period_label"], y=aum_data["aum_cr"],
-            name="AUM", marker_color=COLOR_AUM, opacity=0.85,
-            text=aum_labels, textposition="outside", textfont=dict(size=11),
-            hovertemplate="AUM: \u20b9%{y:,.0f} Cr<extra></extra>",
-        ), secondary_y=False)
-
-        fig_aum.add_trace(go.Scatter(
-            x=aum_data["period_label"], y=aum_data["yoy_pct"],
-            name="YoY AUM Growth %", line=dict(color="#f59e0b", width=2.5),
-            mode="lines+markers", marker=dict(size=6), connectgaps=True,
-            hovertemplate="YoY: %{y:+.1f}%<extra></extra>",
-        ), secondary_y=True)
-
-        fig_aum.update_layout(
-            height=460, barmode="relative",
-            legend=dict(orientation="h", y=1.08, font=dict(size=12)),
-            **CHART_THEME, hovermode="x",
-            xaxis=dict(**AXIS_STYLE, tickfont=dict(size=12)),
-            yaxis=dict(title="AUM (\u20b9 Cr)", **AXIS_STYLE),
-            yaxis2=dict(title="YoY Growth (%)", gridcolor="rgba(0,0,0,0)",
-                        ticksuffix="%"),
-        )
-        st.plotly_chart(fig_aum, use_container_width=True)
+        st.plotly_chart(aum_trend_figure(period, categories), use_container_width=True)
 
     # ── Category stacked bar ──────────────────────────────────────
     st.markdown(
@@ -450,36 +684,8 @@ with tab1:
         unsafe_allow_html=True,
     )
 
-    cat_agg = agg_by_period(df, period, extra_group=["sub_category"])
     if not cat_agg.empty:
-        cat_pivot = cat_agg.pivot_table(
-            index="period_label", columns="sub_category",
-            values="net_flow_cr", aggfunc="sum"
-        ).fillna(0)
-        order_map = cat_agg.drop_duplicates("period_label").set_index("period_label")["period_sort"]
-        sorted_idx = order_map.sort_values().index.tolist()
-        cat_pivot = cat_pivot.reindex([x for x in sorted_idx if x in cat_pivot.index])
-
-        # Limit to top 10 categories by total absolute flow
-        cat_totals = cat_pivot.abs().sum().nlargest(10).index.tolist()
-        cat_pivot = cat_pivot[cat_totals]
-
-        palette = px.colors.qualitative.Set2
-        fig2 = go.Figure()
-        for i, col in enumerate(cat_pivot.columns):
-            fig2.add_trace(go.Bar(
-                x=cat_pivot.index, y=cat_pivot[col], name=col,
-                marker_color=palette[i % len(palette)],
-                hovertemplate=f"<b>{col}</b>: " + "\u20b9%{y:,.0f} Cr<extra></extra>",
-            ))
-        fig2.update_layout(
-            barmode="relative", height=440,
-            **CHART_THEME, hovermode="x",
-            legend=dict(orientation="h", y=-0.25, font=dict(size=11), traceorder="normal"),
-            xaxis=dict(title="", tickfont=dict(size=12), **AXIS_STYLE),
-            yaxis=dict(title="Net Flow (\u20b9 Cr)", **AXIS_STYLE),
-        )
-        st.plotly_chart(fig2, use_container_width=True)
+        st.plotly_chart(subcat_flow_figure(period, categories), use_container_width=True)
 
 
 # ═══════════════════════════════════════════════════════════════════════
@@ -496,17 +702,16 @@ with tab2:
     with col_l:
         st.markdown("**\U0001f7e2 Top 10 Schemes by Inflow**")
         top_in = (
-            df_latest.nlargest(10, "net_flow_cr")
-            [["scheme_name", "net_flow_cr", "aum_cur_cr", "sub_category"]].copy()
-        )
-        top_in["short_name"] = top_in["scheme_name"].str.replace(
-            "ICICI Prudential ", "", regex=False
+            top_k(df_latest, "net_flow_cr", 10)
+            [["scheme_name", "net_flow_cr", "aum_cur_cr", "sub_category"]]
+            .assign(short_name=lambda d: d["scheme_name"].str.removeprefix(
+                "ICICI Prudential "))
         )
         sorted_in = top_in.sort_values("net_flow_cr")
         fig3 = go.Figure(go.Bar(
             x=sorted_in["net_flow_cr"], y=sorted_in["short_name"],
             orientation="h", marker_color=COLOR_POS,
-            text=[fmt_cr(v) for v in sorted_in["net_flow_cr"]],
+            text=fmt_cr_vec(sorted_in["net_flow_cr"]),
             textposition="outside", textfont=dict(size=11), cliponaxis=False,
             hovertemplate="<b>%{y}</b><br>Flow: \u20b9%{x:,.0f} Cr<extra></extra>",
         ))
@@ -520,17 +725,16 @@ with tab2:
     with col_r:
         st.markdown("**\U0001f534 Top 10 Schemes by Outflow**")
         top_out = (
-            df_latest.nsmallest(10, "net_flow_cr")
-            [["scheme_name", "net_flow_cr", "aum_cur_cr", "sub_category"]].copy()
-        )
-        top_out["short_name"] = top_out["scheme_name"].str.replace(
-            "ICICI Prudential ", "", regex=False
+            top_k(df_latest, "net_flow_cr", 10, largest=False)
+            [["scheme_name", "net_flow_cr", "aum_cur_cr", "sub_category"]]
+            .assign(short_name=lambda d: d["scheme_name"].str.removeprefix(
+                "ICICI Prudential "))
         )
         sorted_out = top_out.sort_values("net_flow_cr", ascending=False)
         fig4 = go.Figure(go.Bar(
             x=sorted_out["net_flow_cr"], y=sorted_out["short_name"],
             orientation="h", marker_color=COLOR_NEG,
-            text=[fmt_cr(v) for v in sorted_out["net_flow_cr"]],
+            text=fmt_cr_vec(sorted_out["net_flow_cr"]),
             textposition="outside", textfont=dict(size=11), cliponaxis=False,
             hovertemplate="<b>%{y}</b><br>Flow: \u20b9%{x:,.0f} Cr<extra></extra>",
         ))
@@ -549,12 +753,11 @@ with tab2:
     )
 
     top_aum = (
-        df_latest.nlargest(20, "aum_cur_cr")
-        [["scheme_name", "net_flow_cr", "aum_cur_cr", "sub_category"]].copy()
+        top_k(df_latest, "aum_cur_cr", 20)
+        [["scheme_name", "net_flow_cr", "aum_cur_cr", "sub_category"]]
         .sort_values("aum_cur_cr")
-    )
-    top_aum["short_name"] = top_aum["scheme_name"].str.replace(
-        "ICICI Prudential ", "", regex=False
+        .assign(short_name=lambda d: d["scheme_name"].str.removeprefix(
+            "ICICI Prudential "))
     )
 
     fig_major = make_subplots(
@@ -565,17 +768,17 @@ with tab2:
     fig_major.add_trace(go.Bar(
         x=top_aum["aum_cur_cr"], y=top_aum["short_name"],
         orientation="h", marker_color=COLOR_AUM, opacity=0.8,
-        text=[fmt_cr(v) for v in top_aum["aum_cur_cr"]],
+        text=fmt_cr_vec(top_aum["aum_cur_cr"]),
         textposition="outside", textfont=dict(size=10), cliponaxis=False,
         name="AUM",
         hovertemplate="<b>%{y}</b><br>AUM: \u20b9%{x:,.0f} Cr<extra></extra>",
     ), row=1, col=1)
 
-    bar_colors_aum = [COLOR_POS if v >= 0 else COLOR_NEG for v in top_aum["net_flow_cr"]]
+    bar_colors_aum = sign_colors(top_aum["net_flow_cr"])
     fig_major.add_trace(go.Bar(
         x=top_aum["net_flow_cr"], y=top_aum["short_name"],
         orientation="h", marker_color=bar_colors_aum,
-        text=[fmt_cr(v) for v in top_aum["net_flow_cr"]],
+        text=fmt_cr_vec(top_aum["net_flow_cr"]),
         textposition="outside", textfont=dict(size=10), cliponaxis=False,
         name="Net Flow",
         hovertemplate="<b>%{y}</b><br>Flow: \u20b9%{x:,.0f} Cr<extra></extra>",
@@ -594,31 +797,31 @@ with tab2:
         "<div class='section-header'>Flow vs AUM \u2014 Size = AUM, Color = Flow direction</div>",
         unsafe_allow_html=True,
     )
-    scatter_df = df_latest.dropna(subset=["net_flow_cr", "aum_cur_cr"]).copy()
-    scatter_df["flow_dir"] = scatter_df["net_flow_cr"].apply(
-        lambda x: "Inflow" if x >= 0 else "Outflow"
-    )
-    scatter_df["short_name"] = scatter_df["scheme_name"].str.replace(
-        "ICICI Prudential ", "", regex=False
+    scatter_df = df_latest.dropna(subset=["net_flow_cr", "aum_cur_cr"]).assign(
+        flow_dir=lambda d: np.where(d["net_flow_cr"] >= 0, "Inflow", "Outflow"),
+        short_name=lambda d: d["scheme_name"].str.removeprefix(
+            "ICICI Prudential "),
     )
 
-    fig5 = px.scatter(
-        scatter_df, x="aum_cur_cr", y="net_flow_cr",
-        color="flow_dir", size="aum_cur_cr", size_max=40, opacity=0.75,
-        color_discrete_map={"Inflow": COLOR_POS, "Outflow": COLOR_NEG},
-        hover_name="short_name",
-        labels={"aum_cur_cr": "AUM (\u20b9 Cr)", "net_flow_cr": "Net Flow (\u20b9 Cr)"},
-        height=440,
-    )
-    fig5.update_traces(
-        hovertemplate="<b>%{hovertext}</b><br>"
-                      "AUM: \u20b9%{x:,.0f} Cr<br>"
-                      "Flow: \u20b9%{y:,.0f} Cr<extra></extra>"
-    )
+    # WebGL scatter; bubble area scaled like px.scatter(size_max=40)
+    size_ref = 2.0 * scatter_df["aum_cur_cr"].max() / 40 ** 2
+    fig5 = go.Figure()
+    for flow_dir, color in (("Inflow", COLOR_POS), ("Outflow", COLOR_NEG)):
+        pts = scatter_df[scatter_df["flow_dir"] == flow_dir]
+        fig5.add_trace(go.Scattergl(
+            x=pts["aum_cur_cr"], y=pts["net_flow_cr"], name=flow_dir,
+            mode="markers", hovertext=pts["short_name"],
+            marker=dict(size=pts["aum_cur_cr"], sizemode="area", sizeref=size_ref,
+                        color=color, opacity=0.75),
+            hovertemplate="<b>%{hovertext}</b><br>"
+                          "AUM: \u20b9%{x:,.0f} Cr<br>"
+                          "Flow: \u20b9%{y:,.0f} Cr<extra></extra>",
+        ))
     fig5.add_hline(y=0, line_dash="dash", line_color="#9ca3af", line_width=1)
     fig5.update_layout(
-        **CHART_THEME,
-        xaxis=dict(**AXIS_STYLE), yaxis=dict(**AXIS_STYLE),
+        height=440, **CHART_THEME,
+        xaxis=dict(title="AUM (\u20b9 Cr)", **AXIS_STYLE),
+        yaxis=dict(title="Net Flow (\u20b9 Cr)", **AXIS_STYLE),
         legend=dict(font=dict(size=13)),
     )
     st.plotly_chart(fig5, use_container_width=True)
@@ -631,12 +834,11 @@ with tab2:
     all_schemes = sorted(df["scheme_name"].unique())
     sel_scheme = st.selectbox("Select Scheme", all_schemes)
 
-    sch_df = df[df["scheme_name"] == sel_scheme]
-    sch_agg = agg_by_period(sch_df, period)
+    sch_agg = scheme_period_agg(sel_scheme, period)
 
     if not sch_agg.empty:
         fig6 = make_subplots(specs=[[{"secondary_y": True}]])
-        bar_colors = [COLOR_POS if v >= 0 else COLOR_NEG for v in sch_agg["net_flow_cr"]]
+        bar_colors = sign_colors(sch_agg["net_flow_cr"])
         fig6.add_trace(
             go.Bar(x=sch_agg["period_label"], y=sch_agg["net_flow_cr"],
                    name="Net Flow", marker_color=bar_colors,
@@ -669,39 +871,10 @@ with tab3:
     )
     st.caption("Red = outflows, Green = inflows.")
 
-    cat_hm = agg_by_period(df, period, extra_group=["sub_category"])
+    _, cat_hm = build_period_frames(period, categories)
     if not cat_hm.empty:
-        hm_pivot = cat_hm.pivot_table(
-            index="sub_category", columns="period_label",
-            values="net_flow_cr", aggfunc="sum"
-        ).fillna(0)
-
-        order_map = cat_hm.drop_duplicates("period_label").set_index("period_label")["period_sort"]
-        sorted_idx = order_map.sort_values().index.tolist()
-        hm_pivot = hm_pivot.reindex(columns=[x for x in sorted_idx if x in hm_pivot.columns])
-
-        if not hm_pivot.empty:
-            fig7 = go.Figure(data=go.Heatmap(
-                z=hm_pivot.values,
-                x=hm_pivot.columns.tolist(),
-                y=hm_pivot.index.tolist(),
-                colorscale=[
-                    [0.0, "#dc2626"], [0.4, "#fecaca"],
-                    [0.5, "#f3f4f6"], [0.6, "#bbf7d0"], [1.0, "#16a34a"],
-                ],
-                zmid=0,
-                text=[[fmt_cr(v) for v in row] for row in hm_pivot.values],
-                texttemplate="%{text}",
-                textfont=dict(size=10, color="#1f2937"),
-                hovertemplate="<b>%{y}</b><br>%{x}: %{text}<extra></extra>",
-                colorbar=dict(title="\u20b9 Cr", tickfont=dict(size=11)),
-            ))
-            fig7.update_layout(
-                height=max(350, len(hm_pivot) * 48),
-                **CHART_THEME,
-                xaxis=dict(side="top", tickfont=dict(size=12)),
-                yaxis=dict(autorange="reversed", tickfont=dict(size=11)),
-            )
+        fig7 = subcat_heatmap_figure(period, categories)
+        if fig7 is not None:
             st.plotly_chart(fig7, use_container_width=True)
 
     # Cumulative
@@ -709,11 +882,11 @@ with tab3:
         "<div class='section-header'>Cumulative Net Flow by Category (all data)</div>",
         unsafe_allow_html=True,
     )
-    cum = df.groupby("sub_category")["net_flow_cr"].sum().sort_values()
+    cum = df.groupby("sub_category", observed=True)["net_flow_cr"].sum().sort_values()
     fig8 = go.Figure(go.Bar(
         x=cum.values, y=cum.index, orientation="h",
-        marker_color=[COLOR_POS if v >= 0 else COLOR_NEG for v in cum.values],
-        text=[fmt_cr(v) for v in cum.values],
+        marker_color=sign_colors(cum.values),
+        text=fmt_cr_vec(cum.values),
         textposition="outside", textfont=dict(size=12), cliponaxis=False,
         hovertemplate="<b>%{y}</b>: \u20b9%{x:,.0f} Cr<extra></extra>",
     ))
@@ -737,13 +910,13 @@ with tab5:
 
     # ── AUM by Category: Donut + Horizontal Bar side-by-side ──
     aum_by_cat = (
-        df_latest.groupby("sub_category")["aum_cur_cr"]
+        df_latest.groupby("sub_category", observed=True)["aum_cur_cr"]
         .sum()
         .sort_values(ascending=False)
         .reset_index()
     )
     aum_by_cat["pct"] = aum_by_cat["aum_cur_cr"] / aum_by_cat["aum_cur_cr"].sum() * 100
-    aum_by_cat["aum_fmt"] = aum_by_cat["aum_cur_cr"].apply(fmt_cr)
+    aum_by_cat["aum_fmt"] = fmt_cr_vec(aum_by_cat["aum_cur_cr"])
 
     col_donut, col_bar = st.columns([1, 1])
 
@@ -794,7 +967,7 @@ with tab5:
             y=aum_by_cat.sort_values("aum_cur_cr")["sub_category"],
             orientation="h",
             marker_color=COLOR_AUM, opacity=0.85,
-            text=[fmt_cr(v) for v in aum_by_cat.sort_values("aum_cur_cr")["aum_cur_cr"]],
+            text=fmt_cr_vec(aum_by_cat.sort_values("aum_cur_cr")["aum_cur_cr"]),
             textposition="outside", textfont=dict(size=11), cliponaxis=False,
             hovertemplate="<b>%{y}</b><br>AUM: \u20b9%{x:,.0f} Cr<extra></extra>",
         ))
@@ -813,14 +986,15 @@ with tab5:
     n_top = st.slider("Number of schemes to show", min_value=5, max_value=30, value=15, step=5)
 
     top_aum_dd = (
-        df_latest.nlargest(n_top, "aum_cur_cr")
-        [["scheme_name", "sub_category", "aum_cur_cr", "net_flow_cr"]].copy()
-    )
-    top_aum_dd["short_name"] = top_aum_dd["scheme_name"].str.replace(
-        "ICICI Prudential ", "", regex=False
+        top_k(df_latest, "aum_cur_cr", n_top)
+        [["scheme_name", "sub_category", "aum_cur_cr", "net_flow_cr"]]
+        .assign(
+            short_name=lambda d: d["scheme_name"].str.removeprefix(
+                "ICICI Prudential "),
+            aum_fmt=lambda d: fmt_cr_vec(d["aum_cur_cr"]),
+            flow_fmt=lambda d: fmt_cr_vec(d["net_flow_cr"]),
+        )
     )
-    top_aum_dd["aum_fmt"] = top_aum_dd["aum_cur_cr"].apply(fmt_cr)
-    top_aum_dd["flow_fmt"] = top_aum_dd["net_flow_cr"].apply(fmt_cr)
 
     fig_top_sch = px.bar(
         top_aum_dd.sort_values("aum_cur_cr"),
@@ -860,11 +1034,11 @@ with tab5:
     )
     st.caption("Box size = AUM. Color = Flow/AUM %. Click a category to drill into schemes.")
 
-    tree_df = df_latest[["scheme_name", "sub_category", "aum_cur_cr", "net_flow_cr"]].copy()
-    tree_df = tree_df.dropna(subset=["aum_cur_cr"])
-    tree_df = tree_df[tree_df["aum_cur_cr"] > 0]
-    tree_df["aum_fmt"] = tree_df["aum_cur_cr"].apply(fmt_cr)
-    tree_df["flow_pct_tree"] = (tree_df["net_flow_cr"] / tree_df["aum_cur_cr"] * 100).round(2)
+    tree_df = df_latest[["scheme_name", "sub_category", "aum_cur_cr", "net_flow_cr"]]
+    tree_df = tree_df[tree_df["aum_cur_cr"] > 0].assign(
+        aum_fmt=lambda d: fmt_cr_vec(d["aum_cur_cr"]),
+        flow_pct_tree=lambda d: (d["net_flow_cr"] / d["aum_cur_cr"] * 100).round(2),
+    )
 
     if not tree_df.empty:
         fig_tree = px.treemap(
@@ -901,7 +1075,7 @@ with tab5:
         unsafe_allow_html=True,
     )
     cat_table = (
-        df_latest.groupby("sub_category")
+        df_latest.groupby("sub_category", observed=True)
         .agg(
             num_schemes=("scheme_name", "nunique"),
             total_aum=("aum_cur_cr", "sum"),
@@ -951,7 +1125,6 @@ with tab4:
           "aum_cur_cr", "aum_prev_cr", "expected_aum_cr",
           "nav_cur", "nav_prev", "nav_return",
           "net_flow_cr", "flow_pct"]]
-        .copy()
     )
 
     show_df.columns = [
@@ -960,28 +1133,26 @@ with tab4:
         "NAV Cur", "NAV Prev", "NAV Return",
         "Net Flow (\u20b9Cr)", "Flow %",
     ]
+    cr_cols = ["AUM Cur (\u20b9Cr)", "AUM Prev (\u20b9Cr)", "Expected AUM (\u20b9Cr)",
+               "Net Flow (\u20b9Cr)"]
+    show_df[cr_cols] = show_df[cr_cols].round(0)
 
-    for col in ["AUM Cur (\u20b9Cr)", "AUM Prev (\u20b9Cr)", "Expected AUM (\u20b9Cr)",
-                "Net Flow (\u20b9Cr)"]:
-        show_df[col] = show_df[col].apply(lambda x: round(x, 0) if pd.notna(x) else None)
-    show_df["NAV Return"] = show_df["NAV Return"].apply(
-        lambda x: f"{x:.4f}" if pd.notna(x) else None
-    )
-    show_df["Flow %"] = show_df["Flow %"].apply(
-        lambda x: f"{x:+.2f}%" if pd.notna(x) else None
-    )
-
-    st.dataframe(show_df, use_container_width=True, height=500)
+    # Values stay numeric; st.dataframe formats them client-side.
+    raw_cols = {c: st.column_config.NumberColumn(format="%.0f") for c in cr_cols}
+    raw_cols["NAV Return"] = st.column_config.NumberColumn(format="%.4f")
+    raw_cols["Flow %"] = st.column_config.NumberColumn(format="%+.2f%%")
+    st.dataframe(show_df, use_container_width=True, height=500, column_config=raw_cols)
 
-    csv = show_df.to_csv(index=False)
-    st.download_button("\u2b07\ufe0f Download CSV", csv, "icici_pru_flows.csv", "text/csv")
+    # Built only when clicked (deferred), then served from cache
+    st.download_button("\u2b07\ufe0f Download CSV", lambda: raw_csv_bytes(show_df),
+                       "icici_pru_flows.csv", "text/csv")
 
     # Pipeline log
     st.markdown(
         "<div class='section-header'>Pipeline run log</div>",
         unsafe_allow_html=True,
     )
-    log_df = pl.load_pipeline_log()
+    log_df = load_pipeline_log()
     if not log_df.empty:
         st.dataframe(log_df, use_container_width=True)
 
@@ -8,13 +8,14 @@ Runs on port 8502.
 Launch: streamlit run app_industry.py --server.port 8502
 """
 
-import os, sqlite3, pandas as pd, numpy as np
+import io, os, sqlite3, pandas as pd, numpy as np
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import date
-from dateutil.relativedelta import relativedelta
+from functools import lru_cache
+from types import MappingProxyType
 
 # ── Page config ──────────────────────────────────────────────────────────────
 st.set_page_config(
@@ -55,33 +56,65 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-CHART_THEME = dict(paper_bgcolor="#ffffff", plot_bgcolor="#fafafa",
-                   font=dict(color="#1f2937", size=13))
-AXIS_STYLE = dict(gridcolor="#e5e7eb", linecolor="#d1d5db")
+# Read-only: only ever splatted into update_layout / axis dicts
+CHART_THEME = MappingProxyType(dict(paper_bgcolor="#ffffff", plot_bgcolor="#fafafa",
+                                    font=dict(color="#1f2937", size=13)))
+AXIS_STYLE = MappingProxyType(dict(gridcolor="#e5e7eb", linecolor="#d1d5db"))
+PLOTLY_CONFIG = {"displaylogo": False,
+                 "modeBarButtonsToRemove": ["lasso2d", "select2d", "autoScale2d"]}
 COLOR_POS = "#16a34a"
 COLOR_NEG = "#dc2626"
 COLOR_AUM = "#2563eb"
+PALETTE = tuple(px.colors.qualitative.Set2) + tuple(px.colors.qualitative.Set3)
+MAX_HEATMAP_LABELS = 200   # above this many cells, heatmap values are hover-only
+MAX_SCATTER_LABELS = 12    # AMCs named on the share scatter; the rest are hover-only
+MAX_BAR_LABELS = 24        # above this many bars, values are shown on hover only (as in app.py)
 
 
 # ── Period helpers ───────────────────────────────────────────────────────────
-def assign_fy(dt):
-    """Indian FY: Apr-Mar. FY26 = Apr 2025 to Mar 2026."""
-    if dt.month >= 4:
-        return f"FY{(dt.year + 1) % 100:02d}"
-    return f"FY{dt.year % 100:02d}"
+@lru_cache(maxsize=None)
+def _fy_key(year, month):
+    if month >= 4:
+        return f"FY{(year + 1) % 100:02d}"
+    return f"FY{year % 100:02d}"
 
 
-def assign_quarter(dt):
-    m = dt.month
-    if m in (4, 5, 6):
+@lru_cache(maxsize=None)
+def _quarter_key(year, month):
+    if month in (4, 5, 6):
         q = "Q1"
-    elif m in (7, 8, 9):
+    elif month in (7, 8, 9):
         q = "Q2"
-    elif m in (10, 11, 12):
+    elif month in (10, 11, 12):
         q = "Q3"
     else:
         q = "Q4"
-    return f"{q} {assign_fy(dt)}"
+    return f"{q} {_fy_key(year, month)}"
+
+
+def assign_fy(dt):
+    """Indian FY: Apr-Mar. FY26 = Apr 2025 to Mar 2026."""
+    return _fy_key(dt.year, dt.month)
+
+
+def assign_quarter(dt):
+    return _quarter_key(dt.year, dt.month)
+
+
+QUARTER_OF_MONTH = np.array(["", "Q4", "Q4", "Q4", "Q1", "Q1", "Q1",
+                             "Q2", "Q2", "Q2", "Q3", "Q3", "Q3"])
+
+
+def assign_fy_vec(s):
+    """Vectorised assign_fy over a datetime Series (numpy str array)."""
+    fy_year = s.dt.year.to_numpy() + (s.dt.month.to_numpy() >= 4)
+    return np.char.add("FY", np.char.zfill((fy_year % 100).astype("U2"), 2))
+
+
+def assign_quarter_vec(s):
+    """Vectorised assign_quarter over a datetime Series (numpy str array)."""
+    q = QUARTER_OF_MONTH[s.dt.month.to_numpy()]
+    return np.char.add(np.char.add(q, " "), assign_fy_vec(s))
 
 
 def get_current_fy():
@@ -93,50 +126,43 @@ def get_current_fy():
 
 def add_period_cols(df):
     """Add fy, quarter, month_lbl columns to monthly data."""
-    df = df.copy()
-    df["fy"] = df["month_end"].apply(assign_fy)
-    df["quarter"] = df["month_end"].apply(assign_quarter)
-    df["month_lbl"] = df["month_end"].dt.strftime("%b '%y")
-    return df
+    return df.assign(
+        fy=assign_fy_vec(df["month_end"]),
+        quarter=assign_quarter_vec(df["month_end"]),
+        month_lbl=df["month_end"].dt.strftime("%b '%y").astype("category"),
+    )
 
 
-def agg_by_period(df, period, extra_group=None):
-    """
-    Aggregate monthly data to the selected period granularity.
-    Two-step: (1) sum schemes → monthly totals, (2) aggregate months → period.
-    extra_group: additional columns to group by (e.g., ["amc"], ["sub_category"]).
-    Returns: period_label, period_sort, net_flow_cr, aum_cr, flow_pct [+ extra cols].
-    """
-    if extra_group is None:
-        extra_group = []
-    df = df.sort_values("month_end").copy()
-
+def with_period(df, period):
+    """Add the _period label for the selected granularity (FY YTD also filters)."""
     if period == "Monthly":
-        df["_period"] = df["month_lbl"]
-    elif period == "Quarterly":
-        df["_period"] = df["quarter"]
-    elif period == "Financial Year":
-        df["_period"] = df["fy"]
-    elif period == "FY YTD":
-        cfy = get_current_fy()
-        df = df[df["fy"] == cfy]
-        df["_period"] = df["month_lbl"]
+        return df.assign(_period=df["month_lbl"])
+    if period == "Quarterly":
+        return df.assign(_period=df["quarter"])
+    if period == "Financial Year":
+        return df.assign(_period=df["fy"])
+    if period == "FY YTD":
+        df = df[df["fy"] == get_current_fy()]
+        return df.assign(_period=df["month_lbl"])
+    return df
 
-    if df.empty:
-        return pd.DataFrame()
 
-    # Step 1: Sum scheme-level data to monthly totals (per extra_group)
-    monthly_grp = extra_group + ["_period", "month_end"]
-    monthly = df.groupby(monthly_grp, sort=False).agg(
+def sum_to_months(df, extra_group, aum_col="aum_cur_cr"):
+    """Step 1: sum rows to monthly totals (per extra_group)."""
+    return df.groupby(extra_group + ["_period", "month_end"], sort=False, observed=True).agg(
         net_flow_cr=("net_flow_cr", "sum"),
-        aum_cr=("aum_cur_cr", "sum"),
+        aum_cr=(aum_col, "sum"),
     ).reset_index().sort_values("month_end")
 
-    # Step 2: Aggregate monthly totals to period level
-    #   Flows: SUM across months in the period
-    #   AUM: last month's total (end-of-period AUM)
+
+def months_to_periods(monthly, extra_group):
+    """
+    Step 2: aggregate monthly totals to period level.
+      Flows: SUM across months in the period
+      AUM: last month's total (end-of-period AUM)
+    """
     grp = extra_group + ["_period"]
-    agg = monthly.groupby(grp, sort=False).agg(
+    agg = monthly.groupby(grp, sort=False, observed=True).agg(
         net_flow_cr=("net_flow_cr", "sum"),
         aum_cr=("aum_cr", "last"),
         period_sort=("month_end", "max"),
@@ -149,6 +175,21 @@ def agg_by_period(df, period, extra_group=None):
     return agg.sort_values("period_sort")
 
 
+def agg_by_period(df, period, extra_group=None):
+    """
+    Aggregate monthly data to the selected period granularity.
+    Two-step: (1) sum schemes → monthly totals, (2) aggregate months → period.
+    extra_group: additional columns to group by (e.g., ["amc"], ["sub_category"]).
+    Returns: period_label, period_sort, net_flow_cr, aum_cr, flow_pct [+ extra cols].
+    """
+    if extra_group is None:
+        extra_group = []
+    df = with_period(df.sort_values("month_end", kind="stable"), period)
+    if df.empty:
+        return pd.DataFrame()
+    return months_to_periods(sum_to_months(df, extra_group), extra_group)
+
+
 def aggregate_period_schemes(df, period_months):
     """Aggregate scheme-level data across multiple months for a period.
     Flows are summed, AUM takes the last available month's value."""
@@ -157,7 +198,7 @@ def aggregate_period_schemes(df, period_months):
         return df_p
     grp_cols = ["amc", "scheme_name", "category", "sub_category"]
     available_grp = [c for c in grp_cols if c in df_p.columns]
-    agg = df_p.sort_values("month_end").groupby(available_grp, sort=False).agg(
+    agg = df_p.sort_values("month_end").groupby(available_grp, sort=False, observed=True).agg(
         net_flow_cr=("net_flow_cr", "sum"),
         aum_cur_cr=("aum_cur_cr", "last"),
     ).reset_index()
@@ -166,22 +207,19 @@ def aggregate_period_schemes(df, period_months):
 
 def compute_yoy_growth(agg_df, value_col="aum_cr"):
     """Add YoY growth % column to an aggregated DataFrame.
-    Compares each period to the period ~12 months prior."""
-    agg_df = agg_df.reset_index(drop=True).copy()
-    yoy = []
-    for i, row in agg_df.iterrows():
-        target = row["period_sort"] - pd.DateOffset(years=1)
-        prev = agg_df[agg_df["period_sort"].between(
-            target - pd.Timedelta(days=45), target + pd.Timedelta(days=45)
-        )]
-        if not prev.empty and prev.iloc[0][value_col] > 0:
-            yoy.append(
-                (row[value_col] - prev.iloc[0][value_col]) / prev.iloc[0][value_col] * 100
-            )
-        else:
-            yoy.append(None)
-    agg_df["yoy_pct"] = yoy
-    return agg_df
+    Compares each period to the period nearest 12 months prior (within 45 days)."""
+    agg_df = agg_df.reset_index(drop=True)
+    prev_year = pd.DataFrame({
+        "period_sort": agg_df["period_sort"] + pd.DateOffset(years=1),
+        "prev_val": agg_df[value_col],
+    }).sort_values("period_sort")
+    prev_val = pd.merge_asof(
+        agg_df[["period_sort"]], prev_year, on="period_sort",
+        direction="nearest", tolerance=pd.Timedelta(days=45),
+    )["prev_val"]
+    return agg_df.assign(yoy_pct=np.where(
+        prev_val > 0, (agg_df[value_col] - prev_val) / prev_val * 100, np.nan
+    ))
 
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
@@ -195,6 +233,50 @@ def fmt_cr(val):
     return f"\u20b9{val:,.0f} Cr"
 
 
+def fmt_cr_vec(values):
+    """Array version of fmt_cr for chart labels (returns a numpy str array)."""
+    a = np.asarray(values, dtype=np.float64)
+    absa = np.abs(a)
+    big, mid = absa >= 1e5, absa >= 1e3
+    scale = np.where(big, 1e5, np.where(mid, 1e3, 1.0))
+    suffix = np.where(big, "L Cr", np.where(mid, "K Cr", " Cr"))
+    body = np.char.mod(np.where(mid, "%.1f", "%.0f"), a / scale)
+    out = np.char.add(np.char.add("\u20b9", body), suffix)
+    return np.where(np.isnan(a), "\u2014", out)
+
+
+def bar_text_position(n_bars):
+    """Outside value labels for short bar series; hover-only past MAX_BAR_LABELS."""
+    return "outside" if n_bars <= MAX_BAR_LABELS else "none"
+
+
+def gl_lines(df, x, y, color, hovertemplate, height, y_title, legend_title="AMC"):
+    """One WebGL lines+markers trace per `color` group (stand-in for px.line)."""
+    palette = px.colors.qualitative.Plotly
+    fig = go.Figure()
+    for i, (name, grp) in enumerate(df.groupby(color, sort=False, observed=True)):
+        c = palette[i % len(palette)]
+        fig.add_trace(go.Scattergl(
+            x=grp[x].to_numpy(), y=grp[y].to_numpy(), name=name, legendgroup=name,
+            mode="lines+markers", line=dict(color=c), marker=dict(color=c),
+            hovertemplate=hovertemplate,
+        ))
+    fig.update_layout(height=height, legend_title_text=legend_title,
+                      xaxis_title="", yaxis_title=y_title)
+    return fig
+
+
+@st.cache_data(ttl=3600)
+def raw_csv_bytes(show_df):
+    """Tab 4 CSV export, with Flow % written as formatted text."""
+    flow_pct = show_df["Flow %"].to_numpy(dtype=np.float64)
+    buf = io.BytesIO()
+    show_df.assign(
+        **{"Flow %": np.where(np.isnan(flow_pct), None, np.char.mod("%+.1f%%", flow_pct))}
+    ).to_csv(buf, index=False, encoding="utf-8")
+    return buf.getvalue()
+
+
 def kpi(label, value, sub="", css_class=""):
     return f"""<div class='kpi-card'>
         <div class='kpi-label'>{label}</div>
@@ -205,22 +287,88 @@ def kpi(label, value, sub="", css_class=""):
 
 def db_has_data():
     try:
-        con = sqlite3.connect(DB_PATH)
-        c = con.execute("SELECT COUNT(*) FROM industry_flows").fetchone()[0]
-        con.close()
-        return c > 0
+        return bool(_conn().execute(
+            "SELECT EXISTS(SELECT 1 FROM industry_flows)").fetchone()[0])
     except Exception:
         return False
 
 
+@st.cache_resource
+def _conn():
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    con.execute("PRAGMA query_only = 1")
+    return con
+
+
 @st.cache_data(ttl=3600)
-def load_data():
-    df = pl.load_flows(months=120)
+def load_data(categories):
+    df = pl.load_flows(months=120, categories=categories)
     if df.empty:
         return df
-    df["month_end"] = pd.to_datetime(df["month_end"])
-    df = add_period_cols(df)
-    return df
+    return add_period_cols(df)
+
+
+@st.cache_data(ttl=3600)
+def load_monthly(categories):
+    """Pre-summed AMC x sub-category monthly totals (industry_flows_monthly)."""
+    return add_period_cols(pl.load_monthly_agg(months=120, categories=categories))
+
+
+@st.cache_data(ttl=3600)
+def build_cube(period, categories, upto):
+    """
+    Monthly flow / AUM totals per (amc, sub_category, _period, month_end) for
+    months up to `upto`. Every period aggregate on the page is a roll-up of it.
+    """
+    df = load_monthly(categories)
+    df = with_period(df[df["month_end"] <= upto].sort_values("month_end"), period)
+    return sum_to_months(df, ["amc", "sub_category"], aum_col="aum_cr")
+
+
+@st.cache_data(ttl=3600)
+def period_agg(period, categories, upto, extra_group=(), amc=None, sub_category=None):
+    """
+    agg_by_period equivalent rolled up from build_cube, optionally for one
+    AMC / sub-category. Keyed on these small arguments, not a hashed DataFrame.
+    """
+    cube = build_cube(period, categories, upto)
+    if amc is not None:
+        cube = cube[cube["amc"] == amc]
+    if sub_category is not None:
+        cube = cube[cube["sub_category"] == sub_category]
+    if cube.empty:
+        return pd.DataFrame()
+    extra_group = list(extra_group)
+    return months_to_periods(sum_to_months(cube, extra_group, aum_col="aum_cr"), extra_group)
+
+
+@st.cache_data(ttl=3600)
+def amc_monthly(amc, categories):
+    """One AMC's sub-category x month totals, read from industry_flows_monthly."""
+    return pl.load_monthly_agg(months=120, categories=categories, amc=amc)
+
+
+@st.cache_data(ttl=3600)
+def amc_period_schemes(_df_all, categories, amc, sub_category, month_ends):
+    """Scheme-level period aggregate for one AMC (and optionally one scheme
+    type), keyed on the selection rather than on the full frame."""
+    mask = _df_all["amc"] == amc
+    if sub_category is not None:
+        mask &= _df_all["sub_category"] == sub_category
+    return aggregate_period_schemes(_df_all[mask], month_ends)
+
+
+@st.cache_data(ttl=3600)
+def amc_category_flows(amc, month_ends, categories):
+    """Cached load_amc_category_flows for the deep-dive's category breakdown."""
+    return pl.load_amc_category_flows(amc, month_ends, categories=categories)
+
+
+@st.cache_data(ttl=3600)
+def amc_top_flows(amc, month_ends, sub_category, categories, largest):
+    """Cached load_top_flows for the deep-dive's top inflow / outflow charts."""
+    return pl.load_top_flows(amc, month_ends, largest=largest,
+                             sub_category=sub_category, categories=categories)
 
 
 # ── Sidebar ──────────────────────────────────────────────────────────────────
@@ -243,7 +391,7 @@ with st.sidebar:
         if st.button("\u2b07\ufe0f Fetch & Compute", use_container_width=True):
             with st.spinner(f"Fetching all AMCs for {pl.MONTH_ABBR[sel_month]} {sel_year}..."):
                 try:
-                    pl.compute_flows_for_month(sel_year, sel_month)
+                    pl.compute_flows_for_month(sel_year, sel_month, force=True)
                     st.cache_data.clear()
                     st.success("Done!")
                 except Exception as e:
@@ -251,27 +399,23 @@ with st.sidebar:
 
         with st.expander("\U0001f4c5 Load Multiple Months"):
             hist_months = st.number_input("Months back", min_value=1, max_value=24, value=6)
-            preview = []
-            for i in range(hist_months, -1, -1):
-                dt = date(sel_year, sel_month, 1) - relativedelta(months=i)
-                preview.append(f"{pl.MONTH_ABBR[dt.month]} {dt.year}")
+            hist_dts = pd.date_range(end=pd.Timestamp(sel_year, sel_month, 1),
+                                     periods=hist_months + 1, freq="MS")
+            preview = [f"{pl.MONTH_ABBR[d.month]} {d.year}" for d in hist_dts]
             st.info(f"**{preview[0]}** to **{preview[-1]}** ({len(preview)} months)")
 
             if st.button("\U0001f504 Load All", use_container_width=True):
-                import time as _time
                 progress = st.progress(0)
-                months_list = []
-                for i in range(hist_months, -1, -1):
-                    dt = date(sel_year, sel_month, 1) - relativedelta(months=i)
-                    months_list.append((dt.year, dt.month))
+                months_list = [(d.year, d.month) for d in hist_dts]
                 for idx, (yr, mn) in enumerate(months_list):
                     st.text(f"Processing {pl.MONTH_ABBR[mn]} {yr}...")
                     try:
-                        pl.compute_flows_for_month(yr, mn)
+                        pl.compute_flows_for_month(yr, mn, analyze=False)
                     except Exception as e:
                         st.warning(f"Error: {pl.MONTH_ABBR[mn]} {yr}: {e}")
                     progress.progress((idx + 1) / len(months_list))
-                    _time.sleep(0.5)
+                # Planner statistics once for the whole batch, as the CLI backfill does
+                pl.analyze_db()
                 st.cache_data.clear()
                 st.success(f"Loaded {len(months_list)} months!")
 
@@ -295,15 +439,16 @@ if not db_has_data():
     st.info("### No data yet\nUse the sidebar to fetch data.")
     st.stop()
 
-df_all = load_data()
+# Category filter is applied in SQL; sorted so the cache key ignores pick order
+categories = tuple(sorted(category_filter))
+df_all = load_data(categories)
 if df_all.empty:
-    st.warning("No data available.")
+    st.warning("No data available." if categories else "No data matches filters.")
     st.stop()
 
-df_all = df_all[df_all["category"].isin(category_filter)]
-if df_all.empty:
-    st.warning("No data matches filters.")
-    st.stop()
+# Fixed colour per sub-category, so stacks keep their colours across periods
+COLOR_BY_SUBCAT = {c: PALETTE[i % len(PALETTE)]
+                   for i, c in enumerate(sorted(df_all["sub_category"].unique()))}
 
 # ── Period Selector (sidebar) ────────────────────────────────────────────────
 with st.sidebar:
@@ -330,36 +475,30 @@ if period == "Monthly":
     selected_period_lbl = pd.Timestamp(latest_month).strftime("%B %Y")
 
 elif period == "Quarterly":
-    _tmp = df_all.copy()
-    _tmp["_q"] = _tmp["month_end"].apply(assign_quarter)
-    q_max = _tmp.groupby("_q")["month_end"].max().sort_values(ascending=False)
+    q_max = df_all.groupby("quarter")["month_end"].max().sort_values(ascending=False)
     quarter_list = q_max.index.tolist()
     with st.sidebar:
         selected_q = st.selectbox("Select Quarter", quarter_list, key="period_selector")
     latest_month = q_max[selected_q]
-    selected_period_months = _tmp[_tmp["_q"] == selected_q]["month_end"].unique().tolist()
+    selected_period_months = df_all.loc[df_all["quarter"] == selected_q, "month_end"].unique().tolist()
     selected_period_lbl = selected_q
 
 elif period == "Financial Year":
-    _tmp = df_all.copy()
-    _tmp["_fy"] = _tmp["month_end"].apply(assign_fy)
-    fy_max = _tmp.groupby("_fy")["month_end"].max().sort_values(ascending=False)
+    fy_max = df_all.groupby("fy")["month_end"].max().sort_values(ascending=False)
     fy_list = fy_max.index.tolist()
     with st.sidebar:
         selected_fy_val = st.selectbox("Select Financial Year", fy_list, key="period_selector")
     latest_month = fy_max[selected_fy_val]
-    selected_period_months = _tmp[_tmp["_fy"] == selected_fy_val]["month_end"].unique().tolist()
+    selected_period_months = df_all.loc[df_all["fy"] == selected_fy_val, "month_end"].unique().tolist()
     selected_period_lbl = selected_fy_val
 
 elif period == "FY YTD":
-    _tmp = df_all.copy()
-    _tmp["_fy"] = _tmp["month_end"].apply(assign_fy)
-    fy_max = _tmp.groupby("_fy")["month_end"].max().sort_values(ascending=False)
+    fy_max = df_all.groupby("fy")["month_end"].max().sort_values(ascending=False)
     fy_list = fy_max.index.tolist()
     with st.sidebar:
         selected_fy_val = st.selectbox("Select Financial Year", fy_list, key="period_selector")
     latest_month = fy_max[selected_fy_val]
-    selected_period_months = _tmp[_tmp["_fy"] == selected_fy_val]["month_end"].unique().tolist()
+    selected_period_months = df_all.loc[df_all["fy"] == selected_fy_val, "month_end"].unique().tolist()
     selected_period_lbl = f"{selected_fy_val} YTD"
 
 latest_month_lbl = selected_period_lbl
@@ -370,16 +509,23 @@ df_all = df_all[df_all["month_end"] <= latest_month]
 
 # FY YTD cumulative (based on selected period's FY)
 cfy = assign_fy(pd.Timestamp(latest_month))
-df_fy_ytd = df_all[df_all["fy"] == cfy]
-fy_ytd_flow = df_fy_ytd["net_flow_cr"].sum()
-fy_ytd_months = df_fy_ytd["month_end"].nunique()
+fy_ytd = df_all[df_all["fy"] == cfy].groupby("month_end", sort=False)["net_flow_cr"].sum()
+fy_ytd_flow = fy_ytd.sum()
+fy_ytd_months = len(fy_ytd)
 
 # Latest PERIOD aggregates (scheme data summed across period months)
 df_latest = aggregate_period_schemes(df_all, selected_period_months)
-total_flow_latest = df_latest["net_flow_cr"].sum()
-total_aum_latest = df_latest["aum_cur_cr"].sum()
-n_schemes = df_latest["scheme_name"].nunique()
-n_amcs = df_latest["amc"].nunique()
+# One pass per AMC feeds every snapshot KPI below
+amc_kpi = df_latest.groupby("amc", sort=False, observed=True).agg(
+    flow=("net_flow_cr", "sum"),
+    aum=("aum_cur_cr", "sum"),
+    n_schemes=("scheme_name", "nunique"),
+)
+total_flow_latest = amc_kpi["flow"].sum()
+total_aum_latest = amc_kpi["aum"].sum()
+n_schemes = amc_kpi["n_schemes"].sum()
+n_amcs = len(amc_kpi)
+n_inflow_amcs = (amc_kpi["flow"] > 0).sum()
 flow_pct_latest = (total_flow_latest / total_aum_latest * 100) if total_aum_latest else 0
 
 
@@ -407,8 +553,7 @@ with k3:
                      f"{n_schemes} schemes \u2022 {n_amcs} AMCs"),
                 unsafe_allow_html=True)
 with k4:
-    inflow_amcs = df_latest.groupby("amc")["net_flow_cr"].sum()
-    st.markdown(kpi("AMCs with Inflow", str((inflow_amcs > 0).sum()),
+    st.markdown(kpi("AMCs with Inflow", str(n_inflow_amcs),
                      "positive net flow", "kpi-pos"),
                 unsafe_allow_html=True)
 with k5:
@@ -434,7 +579,7 @@ tab1, tab2, tab3, tab4 = st.tabs([
 # ═══════════════════════════════════════════════════════════════════════
 with tab1:
     # Aggregate to selected period
-    ind_agg = agg_by_period(df_all, period)
+    ind_agg = period_agg(period, categories, latest_month)
 
     if ind_agg.empty:
         st.warning("No data for selected period.")
@@ -446,18 +591,18 @@ with tab1:
         )
 
         fig_flow = make_subplots(specs=[[{"secondary_y": True}]])
-        flow_colors = [COLOR_POS if v >= 0 else COLOR_NEG for v in ind_agg["net_flow_cr"]]
-        flow_labels = [fmt_cr(v) for v in ind_agg["net_flow_cr"]]
+        flow_colors = np.where(ind_agg["net_flow_cr"] >= 0, COLOR_POS, COLOR_NEG)
+        flow_labels = fmt_cr_vec(ind_agg["net_flow_cr"])
 
         fig_flow.add_trace(go.Bar(
-            x=ind_agg["period_label"], y=ind_agg["net_flow_cr"],
+            x=ind_agg["period_label"].to_numpy(), y=ind_agg["net_flow_cr"].to_numpy(),
             name="Net Flow", marker_color=flow_colors, opacity=0.85,
-            text=flow_labels, textposition="outside", textfont=dict(size=11),
+            text=flow_labels, textposition=bar_text_position(len(ind_agg)), textfont=dict(size=11),
             hovertemplate="Net Flow: \u20b9%{y:,.0f} Cr<extra></extra>",
         ), secondary_y=False)
 
         fig_flow.add_trace(go.Scatter(
-            x=ind_agg["period_label"], y=ind_agg["flow_pct"],
+            x=ind_agg["period_label"].to_numpy(), y=ind_agg["flow_pct"].to_numpy(),
             name="Flow / AUM %", line=dict(color="#7c3aed", width=2.5),
             mode="lines+markers", marker=dict(size=6),
             hovertemplate="Flow/AUM: %{y:+.1f}%<extra></extra>",
@@ -473,7 +618,7 @@ with tab1:
             yaxis2=dict(title="Flow / AUM (%)", gridcolor="rgba(0,0,0,0)",
                         ticksuffix="%", zeroline=True, zerolinecolor="#d1d5db"),
         )
-        st.plotly_chart(fig_flow, use_container_width=True)
+        st.plotly_chart(fig_flow, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── Chart 2: AUM bars + YoY Growth % ──────────────────
         st.markdown(
@@ -482,18 +627,18 @@ with tab1:
         )
 
         aum_agg = compute_yoy_growth(ind_agg)
-        aum_labels = [fmt_cr(v) for v in aum_agg["aum_cr"]]
+        aum_labels = fmt_cr_vec(aum_agg["aum_cr"])
 
         fig_aum = make_subplots(specs=[[{"secondary_y": True}]])
         fig_aum.add_trace(go.Bar(
-            x=aum_agg["period_label"], y=aum_agg["aum_cr"],
+            x=aum_agg["period_label"].to_numpy(), y=aum_agg["aum_cr"].to_numpy(),
             name="AUM", marker_color=COLOR_AUM, opacity=0.85,
-            text=aum_labels, textposition="outside", textfont=dict(size=11),
+            text=aum_labels, textposition=bar_text_position(len(aum_agg)), textfont=dict(size=11),
             hovertemplate="AUM: \u20b9%{y:,.0f} Cr<extra></extra>",
         ), secondary_y=False)
 
         fig_aum.add_trace(go.Scatter(
-            x=aum_agg["period_label"], y=aum_agg["yoy_pct"],
+            x=aum_agg["period_label"].to_numpy(), y=aum_agg["yoy_pct"].to_numpy(),
             name="YoY AUM Growth %", line=dict(color="#f59e0b", width=2.5),
             mode="lines+markers", marker=dict(size=6), connectgaps=True,
             hovertemplate="YoY: %{y:+.1f}%<extra></extra>",
@@ -508,7 +653,7 @@ with tab1:
             yaxis2=dict(title="YoY Growth (%)", gridcolor="rgba(0,0,0,0)",
                         ticksuffix="%"),
         )
-        st.plotly_chart(fig_aum, use_container_width=True)
+        st.plotly_chart(fig_aum, use_container_width=True, config=PLOTLY_CONFIG)
 
     # ── Category stacked bar time-series ──────────────────────
     st.markdown(
@@ -516,23 +661,22 @@ with tab1:
         unsafe_allow_html=True,
     )
 
-    cat_agg = agg_by_period(df_all, period, extra_group=["sub_category"])
+    cat_agg = period_agg(period, categories, latest_month, extra_group=("sub_category",))
     if not cat_agg.empty:
-        cat_pivot = cat_agg.pivot_table(
-            index="period_label", columns="sub_category",
-            values="net_flow_cr", aggfunc="sum"
+        # cat_agg is already one row per (period, sub_category): reshape only
+        cat_pivot = cat_agg.pivot(
+            index="period_label", columns="sub_category", values="net_flow_cr"
         ).fillna(0)
         # Sort by period
         order_map = cat_agg.drop_duplicates("period_label").set_index("period_label")["period_sort"]
         sorted_idx = order_map.sort_values().index.tolist()
         cat_pivot = cat_pivot.reindex([x for x in sorted_idx if x in cat_pivot.index])
 
-        palette = px.colors.qualitative.Set2 + px.colors.qualitative.Set3
         fig_cat_ts = go.Figure()
-        for i, col in enumerate(cat_pivot.columns):
+        for col in cat_pivot.columns:
             fig_cat_ts.add_trace(go.Bar(
                 x=cat_pivot.index, y=cat_pivot[col], name=col,
-                marker_color=palette[i % len(palette)],
+                marker_color=COLOR_BY_SUBCAT[col],
                 hovertemplate=f"<b>{col}</b>: " + "\u20b9%{y:,.0f} Cr<extra></extra>",
             ))
         fig_cat_ts.update_layout(
@@ -542,7 +686,7 @@ with tab1:
             xaxis=dict(tickfont=dict(size=11), **AXIS_STYLE),
             yaxis=dict(title="Net Flow (\u20b9 Cr)", **AXIS_STYLE),
         )
-        st.plotly_chart(fig_cat_ts, use_container_width=True)
+        st.plotly_chart(fig_cat_ts, use_container_width=True, config=PLOTLY_CONFIG)
 
     # ── Category AUM & Share ──────────────────────────────────
     st.markdown(
@@ -552,7 +696,7 @@ with tab1:
     )
 
     cat_aum = (
-        df_latest.groupby("sub_category")
+        df_latest.groupby("sub_category", observed=True)
         .agg(aum=("aum_cur_cr", "sum"), flow=("net_flow_cr", "sum"))
         .reset_index().sort_values("aum", ascending=True)
     )
@@ -562,7 +706,7 @@ with tab1:
     )
 
     fig_cat_aum = go.Figure(go.Bar(
-        x=cat_aum["aum"], y=cat_aum["sub_category"],
+        x=cat_aum["aum"].to_numpy(), y=cat_aum["sub_category"].to_numpy(),
         orientation="h", marker_color=COLOR_AUM, opacity=0.85,
         text=cat_aum["label"],
         textposition="outside", textfont=dict(size=10), cliponaxis=False,
@@ -575,7 +719,7 @@ with tab1:
         xaxis=dict(title="AUM (\u20b9 Cr)", **AXIS_STYLE),
         yaxis=dict(tickfont=dict(size=10), **AXIS_STYLE),
     )
-    st.plotly_chart(fig_cat_aum, use_container_width=True)
+    st.plotly_chart(fig_cat_aum, use_container_width=True, config=PLOTLY_CONFIG)
 
     # ── Category Heatmap ──────────────────────────────────────
     st.markdown(
@@ -584,23 +728,24 @@ with tab1:
     )
 
     if not cat_agg.empty:
-        hm_pivot = cat_agg.pivot_table(
-            index="sub_category", columns="period_label",
-            values="net_flow_cr", aggfunc="sum"
-        ).fillna(0)
-        hm_pivot = hm_pivot.reindex(
-            columns=[x for x in sorted_idx if x in hm_pivot.columns]
-        )
+        hm_pivot = cat_pivot.T  # already period-sorted above
         if not hm_pivot.empty:
+            if hm_pivot.size <= MAX_HEATMAP_LABELS:
+                cell_text = dict(
+                    text=fmt_cr_vec(hm_pivot.values), texttemplate="%{text}",
+                    textfont=dict(size=9, color="#1f2937"),
+                    hovertemplate="<b>%{y}</b><br>%{x}: %{text}<extra></extra>",
+                )
+            else:
+                cell_text = dict(
+                    hovertemplate="<b>%{y}</b><br>%{x}: \u20b9%{z:,.0f} Cr<extra></extra>",
+                )
             fig_hm = go.Figure(data=go.Heatmap(
                 z=hm_pivot.values, x=hm_pivot.columns.tolist(),
                 y=hm_pivot.index.tolist(),
                 colorscale=[[0, "#dc2626"], [0.4, "#fecaca"],
                             [0.5, "#f3f4f6"], [0.6, "#bbf7d0"], [1, "#16a34a"]],
-                zmid=0,
-                text=[[fmt_cr(v) for v in row] for row in hm_pivot.values],
-                texttemplate="%{text}", textfont=dict(size=9, color="#1f2937"),
-                hovertemplate="<b>%{y}</b><br>%{x}: %{text}<extra></extra>",
+                zmid=0, **cell_text,
                 colorbar=dict(title="\u20b9 Cr", tickfont=dict(size=10)),
             ))
             fig_hm.update_layout(
@@ -609,13 +754,15 @@ with tab1:
                 xaxis=dict(side="top", tickfont=dict(size=11)),
                 yaxis=dict(autorange="reversed", tickfont=dict(size=10)),
             )
-            st.plotly_chart(fig_hm, use_container_width=True)
+            st.plotly_chart(fig_hm, use_container_width=True, config=PLOTLY_CONFIG)
 
 
 # ═══════════════════════════════════════════════════════════════════════
 # TAB 2 — AMC MARKET SHARE & COMPARISON
 # ═══════════════════════════════════════════════════════════════════════
-with tab2:
+@st.fragment
+def render_amc_tab(df_all, period, categories, latest_month):
+    """Tab 2 body. A fragment, so the scheme-type selector reruns only this tab."""
     # Scheme type filter for this tab
     all_subcats = sorted(df_all["sub_category"].unique())
     scheme_type_filter = st.selectbox(
@@ -623,8 +770,9 @@ with tab2:
         ["All Scheme Types"] + all_subcats,
         key="tab2_scheme_type",
     )
-    df_tab2 = df_all if scheme_type_filter == "All Scheme Types" else \
-              df_all[df_all["sub_category"] == scheme_type_filter]
+    tab2_subcat = None if scheme_type_filter == "All Scheme Types" else scheme_type_filter
+    df_tab2 = df_all if tab2_subcat is None else \
+              df_all[df_all["sub_category"] == tab2_subcat]
 
     if df_tab2.empty:
         st.warning("No data for selected scheme type.")
@@ -637,24 +785,24 @@ with tab2:
                 unsafe_allow_html=True,
             )
 
-            stype_agg = agg_by_period(df_tab2, period)
+            stype_agg = period_agg(period, categories, latest_month,
+                                   sub_category=tab2_subcat)
 
             if not stype_agg.empty:
                 # Chart A: Net Inflow time-series + Flow/AUM %
                 fig_stype_flow = make_subplots(specs=[[{"secondary_y": True}]])
-                sflow_colors = [COLOR_POS if v >= 0 else COLOR_NEG
-                                for v in stype_agg["net_flow_cr"]]
-                sflow_labels = [fmt_cr(v) for v in stype_agg["net_flow_cr"]]
+                sflow_colors = np.where(stype_agg["net_flow_cr"] >= 0, COLOR_POS, COLOR_NEG)
+                sflow_labels = fmt_cr_vec(stype_agg["net_flow_cr"])
 
                 fig_stype_flow.add_trace(go.Bar(
-                    x=stype_agg["period_label"], y=stype_agg["net_flow_cr"],
+                    x=stype_agg["period_label"].to_numpy(), y=stype_agg["net_flow_cr"].to_numpy(),
                     name="Net Flow", marker_color=sflow_colors, opacity=0.85,
-                    text=sflow_labels, textposition="outside", textfont=dict(size=11),
+                    text=sflow_labels, textposition=bar_text_position(len(stype_agg)), textfont=dict(size=11),
                     hovertemplate="Net Flow: \u20b9%{y:,.0f} Cr<extra></extra>",
                 ), secondary_y=False)
 
                 fig_stype_flow.add_trace(go.Scatter(
-                    x=stype_agg["period_label"], y=stype_agg["flow_pct"],
+                    x=stype_agg["period_label"].to_numpy(), y=stype_agg["flow_pct"].to_numpy(),
                     name="Flow / AUM %", line=dict(color="#7c3aed", width=2.5),
                     mode="lines+markers", marker=dict(size=6),
                     hovertemplate="Flow/AUM: %{y:+.1f}%<extra></extra>",
@@ -670,7 +818,7 @@ with tab2:
                     yaxis2=dict(title="Flow / AUM (%)", gridcolor="rgba(0,0,0,0)",
                                 ticksuffix="%", zeroline=True, zerolinecolor="#d1d5db"),
                 )
-                st.plotly_chart(fig_stype_flow, use_container_width=True)
+                st.plotly_chart(fig_stype_flow, use_container_width=True, config=PLOTLY_CONFIG)
 
                 # Chart B: AUM time-series + YoY Growth
                 st.markdown(
@@ -680,18 +828,18 @@ with tab2:
                 )
 
                 stype_aum = compute_yoy_growth(stype_agg)
-                aum_labels_s = [fmt_cr(v) for v in stype_aum["aum_cr"]]
+                aum_labels_s = fmt_cr_vec(stype_aum["aum_cr"])
 
                 fig_stype_aum = make_subplots(specs=[[{"secondary_y": True}]])
                 fig_stype_aum.add_trace(go.Bar(
-                    x=stype_aum["period_label"], y=stype_aum["aum_cr"],
+                    x=stype_aum["period_label"].to_numpy(), y=stype_aum["aum_cr"].to_numpy(),
                     name="AUM", marker_color=COLOR_AUM, opacity=0.85,
-                    text=aum_labels_s, textposition="outside", textfont=dict(size=11),
+                    text=aum_labels_s, textposition=bar_text_position(len(stype_aum)), textfont=dict(size=11),
                     hovertemplate="AUM: \u20b9%{y:,.0f} Cr<extra></extra>",
                 ), secondary_y=False)
 
                 fig_stype_aum.add_trace(go.Scatter(
-                    x=stype_aum["period_label"], y=stype_aum["yoy_pct"],
+                    x=stype_aum["period_label"].to_numpy(), y=stype_aum["yoy_pct"].to_numpy(),
                     name="YoY AUM Growth %", line=dict(color="#f59e0b", width=2.5),
                     mode="lines+markers", marker=dict(size=6), connectgaps=True,
                     hovertemplate="YoY: %{y:+.1f}%<extra></extra>",
@@ -706,12 +854,13 @@ with tab2:
                     yaxis2=dict(title="YoY Growth (%)", gridcolor="rgba(0,0,0,0)",
                                 ticksuffix="%"),
                 )
-                st.plotly_chart(fig_stype_aum, use_container_width=True)
+                st.plotly_chart(fig_stype_aum, use_container_width=True, config=PLOTLY_CONFIG)
 
             st.markdown("---")
 
         # Aggregate by AMC for selected period
-        amc_agg = agg_by_period(df_tab2, period, extra_group=["amc"])
+        amc_agg = period_agg(period, categories, latest_month,
+                             extra_group=("amc",), sub_category=tab2_subcat)
 
         # Latest period
         latest_period_sort = amc_agg["period_sort"].max()
@@ -746,12 +895,12 @@ with tab2:
             amc_sorted.nlargest(15, "net_flow_cr"),
             amc_sorted.nsmallest(5, "net_flow_cr")
         ]).drop_duplicates().sort_values("net_flow_cr")
-        amc_colors = [COLOR_POS if v >= 0 else COLOR_NEG for v in top_amc["net_flow_cr"]]
+        amc_colors = np.where(top_amc["net_flow_cr"] >= 0, COLOR_POS, COLOR_NEG)
 
         fig_amc_flow = go.Figure(go.Bar(
-            x=top_amc["net_flow_cr"], y=top_amc["amc"],
+            x=top_amc["net_flow_cr"].to_numpy(), y=top_amc["amc"].to_numpy(),
             orientation="h", marker_color=amc_colors,
-            text=[fmt_cr(v) for v in top_amc["net_flow_cr"]],
+            text=fmt_cr_vec(top_amc["net_flow_cr"]),
             textposition="outside", textfont=dict(size=11), cliponaxis=False,
             hovertemplate="<b>%{y}</b><br>Flow: \u20b9%{x:,.0f} Cr<extra></extra>",
         ))
@@ -762,7 +911,7 @@ with tab2:
             xaxis=dict(title="Net Flow (\u20b9 Cr)", **AXIS_STYLE),
             yaxis=dict(tickfont=dict(size=11), **AXIS_STYLE),
         )
-        st.plotly_chart(fig_amc_flow, use_container_width=True)
+        st.plotly_chart(fig_amc_flow, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── AMC Net Inflow Market Share % ─────────────────────────
         _share_suffix = " (Net Outflow Period)" if total_flow_period < 0 else ""
@@ -779,11 +928,10 @@ with tab2:
             amc_flow_share[amc_flow_share["flow_share"] < 0].nsmallest(5, "flow_share"),
         ]).drop_duplicates().sort_values("flow_share")
 
-        share_colors = [COLOR_POS if v >= 0 else COLOR_NEG
-                        for v in amc_flow_share_top["flow_share"]]
+        share_colors = np.where(amc_flow_share_top["flow_share"] >= 0, COLOR_POS, COLOR_NEG)
 
         fig_flow_share = go.Figure(go.Bar(
-            x=amc_flow_share_top["flow_share"], y=amc_flow_share_top["amc"],
+            x=amc_flow_share_top["flow_share"].to_numpy(), y=amc_flow_share_top["amc"].to_numpy(),
             orientation="h", marker_color=share_colors, opacity=0.85,
             text=[f"{v:+.1f}% ({fmt_cr(f)})" for v, f in
                   zip(amc_flow_share_top["flow_share"], amc_flow_share_top["net_flow_cr"])],
@@ -802,7 +950,7 @@ with tab2:
             xaxis=dict(title="Net Inflow Share (%)", ticksuffix="%", **AXIS_STYLE),
             yaxis=dict(tickfont=dict(size=11), **AXIS_STYLE),
         )
-        st.plotly_chart(fig_flow_share, use_container_width=True)
+        st.plotly_chart(fig_flow_share, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── AMC AUM Ranking ──────────────────────────────────────
         st.markdown(
@@ -818,19 +966,19 @@ with tab2:
             subplot_titles=("AUM (\u20b9 Cr)", "Net Flow (\u20b9 Cr)"),
         )
         fig_aum_rank.add_trace(go.Bar(
-            x=amc_by_aum["aum_cr"], y=amc_by_aum["amc"],
+            x=amc_by_aum["aum_cr"].to_numpy(), y=amc_by_aum["amc"].to_numpy(),
             orientation="h", marker_color=COLOR_AUM, opacity=0.8,
-            text=[fmt_cr(v) for v in amc_by_aum["aum_cr"]],
+            text=fmt_cr_vec(amc_by_aum["aum_cr"]),
             textposition="outside", textfont=dict(size=10), cliponaxis=False,
             name="AUM",
             hovertemplate="<b>%{y}</b><br>AUM: \u20b9%{x:,.0f} Cr<extra></extra>",
         ), row=1, col=1)
 
-        fc2 = [COLOR_POS if v >= 0 else COLOR_NEG for v in amc_by_aum["net_flow_cr"]]
+        fc2 = np.where(amc_by_aum["net_flow_cr"] >= 0, COLOR_POS, COLOR_NEG)
         fig_aum_rank.add_trace(go.Bar(
-            x=amc_by_aum["net_flow_cr"], y=amc_by_aum["amc"],
+            x=amc_by_aum["net_flow_cr"].to_numpy(), y=amc_by_aum["amc"].to_numpy(),
             orientation="h", marker_color=fc2,
-            text=[fmt_cr(v) for v in amc_by_aum["net_flow_cr"]],
+            text=fmt_cr_vec(amc_by_aum["net_flow_cr"]),
             textposition="outside", textfont=dict(size=10), cliponaxis=False,
             name="Flow",
             hovertemplate="<b>%{y}</b><br>Flow: \u20b9%{x:,.0f} Cr<extra></extra>",
@@ -842,7 +990,7 @@ with tab2:
         )
         fig_aum_rank.update_xaxes(**AXIS_STYLE)
         fig_aum_rank.update_yaxes(tickfont=dict(size=11), **AXIS_STYLE)
-        st.plotly_chart(fig_aum_rank, use_container_width=True)
+        st.plotly_chart(fig_aum_rank, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── Market Share Comparison: AUM share vs Flow share (scatter) ──
         st.markdown(
@@ -858,22 +1006,29 @@ with tab2:
         scatter_df = amc_latest[amc_latest["aum_share"] > 0.3].copy()  # show only meaningful
         scatter_df["size"] = scatter_df["aum_cr"].clip(lower=100)
 
+        # Label only the biggest movers; the rest are identified on hover
+        rank = scatter_df["flow_share"].abs() + scatter_df["aum_share"]
+        labeled = scatter_df.loc[rank.nlargest(MAX_SCATTER_LABELS).index]
+        rest = scatter_df.drop(labeled.index)
+
         fig_scatter = go.Figure()
-        fig_scatter.add_trace(go.Scatter(
-            x=scatter_df["aum_share"], y=scatter_df["flow_share"],
-            mode="markers+text", text=scatter_df["amc"],
-            textposition="top center", textfont=dict(size=9),
-            marker=dict(
-                size=scatter_df["aum_share"] * 3 + 8,
-                color=[COLOR_POS if v >= 0 else COLOR_NEG for v in scatter_df["flow_share"]],
-                opacity=0.7, line=dict(width=1, color="#d1d5db"),
-            ),
-            hovertemplate=(
-                "<b>%{text}</b><br>"
-                "AUM Share: %{x:.1f}%<br>"
-                "Flow Share: %{y:.1f}%<extra></extra>"
-            ),
-        ))
+        for pts, mode in ((rest, "markers"), (labeled, "markers+text")):
+            fig_scatter.add_trace(go.Scatter(
+                x=pts["aum_share"].to_numpy(), y=pts["flow_share"].to_numpy(),
+                mode=mode, text=pts["amc"] if mode == "markers+text" else None,
+                customdata=pts["amc"],
+                textposition="top center", textfont=dict(size=9),
+                marker=dict(
+                    size=pts["aum_share"] * 3 + 8,
+                    color=np.where(pts["flow_share"] >= 0, COLOR_POS, COLOR_NEG),
+                    opacity=0.7, line=dict(width=1, color="#d1d5db"),
+                ),
+                hovertemplate=(
+                    "<b>%{customdata}</b><br>"
+                    "AUM Share: %{x:.1f}%<br>"
+                    "Flow Share: %{y:.1f}%<extra></extra>"
+                ),
+            ))
         # Diagonal line
         max_val = max(scatter_df["aum_share"].max(), abs(scatter_df["flow_share"]).max(), 10) * 1.1
         fig_scatter.add_shape(
@@ -887,7 +1042,7 @@ with tab2:
                        zerolinecolor="#d1d5db", **AXIS_STYLE),
             showlegend=False,
         )
-        st.plotly_chart(fig_scatter, use_container_width=True)
+        st.plotly_chart(fig_scatter, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── AMC Net Inflow Share % Trends (top 10) ─────────────────
         st.markdown(
@@ -897,7 +1052,7 @@ with tab2:
 
         if len(amc_agg["period_label"].unique()) > 1:
             # Compute flow share % by period
-            period_flow_totals = amc_agg.groupby("period_label").agg(
+            period_flow_totals = amc_agg.groupby("period_label", sort=False, observed=True).agg(
                 total_flow=("net_flow_cr", "sum"),
             ).reset_index()
             amc_share_flow = amc_agg.merge(period_flow_totals, on="period_label")
@@ -908,20 +1063,16 @@ with tab2:
             )
 
             top_amcs = (
-                amc_share_flow.groupby("amc")["net_flow_cr"]
-                .apply(lambda x: x.abs().sum())
+                amc_share_flow.assign(abs_flow=amc_share_flow["net_flow_cr"].abs())
+                .groupby("amc", observed=True)["abs_flow"].sum()
                 .nlargest(10).index.tolist()
             )
             amc_ts = amc_share_flow[amc_share_flow["amc"].isin(top_amcs)].sort_values("period_sort")
 
-            fig_amc_trend = px.line(
-                amc_ts, x="period_label", y="flow_share_pct", color="amc",
-                markers=True, height=460,
-                labels={"flow_share_pct": "Net Inflow Share (%)",
-                        "period_label": "", "amc": "AMC"},
-            )
-            fig_amc_trend.update_traces(
-                hovertemplate="<b>%{fullData.name}</b><br>Inflow Share: %{y:.1f}%<extra></extra>"
+            fig_amc_trend = gl_lines(
+                amc_ts, "period_label", "flow_share_pct", "amc", height=460,
+                y_title="Net Inflow Share (%)",
+                hovertemplate="<b>%{fullData.name}</b><br>Inflow Share: %{y:.1f}%<extra></extra>",
             )
             fig_amc_trend.update_layout(
                 **CHART_THEME, hovermode="x",
@@ -929,7 +1080,7 @@ with tab2:
                 yaxis=dict(title="Net Inflow Share (%)", ticksuffix="%", **AXIS_STYLE),
                 legend=dict(font=dict(size=11)),
             )
-            st.plotly_chart(fig_amc_trend, use_container_width=True)
+            st.plotly_chart(fig_amc_trend, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── AMC Market Share Time-Series ──────────────────────────
         if len(amc_agg["period_label"].unique()) > 1:
@@ -938,38 +1089,42 @@ with tab2:
                 unsafe_allow_html=True,
             )
             # Compute AUM share by period
-            period_totals = amc_agg.groupby("period_label").agg(
+            period_totals = amc_agg.groupby("period_label", sort=False, observed=True).agg(
                 total_aum=("aum_cr", "sum"),
             ).reset_index()
             amc_share_ts = amc_agg.merge(period_totals, on="period_label")
             amc_share_ts["aum_share"] = amc_share_ts["aum_cr"] / amc_share_ts["total_aum"] * 100
 
             top_aum_amcs = (
-                amc_share_ts.groupby("amc")["aum_cr"].sum()
+                amc_share_ts.groupby("amc", observed=True)["aum_cr"].sum()
                 .nlargest(10).index.tolist()
             )
             share_ts_top = amc_share_ts[amc_share_ts["amc"].isin(top_aum_amcs)].sort_values("period_sort")
 
-            fig_share_trend = px.line(
-                share_ts_top, x="period_label", y="aum_share", color="amc",
-                markers=True, height=460,
-                labels={"aum_share": "AUM Share (%)", "period_label": "", "amc": "AMC"},
-            )
-            fig_share_trend.update_traces(
-                hovertemplate="<b>%{fullData.name}</b><br>Share: %{y:.1f}%<extra></extra>"
+            fig_share_trend = gl_lines(
+                share_ts_top, "period_label", "aum_share", "amc", height=460,
+                y_title="AUM Share (%)",
+                hovertemplate="<b>%{fullData.name}</b><br>Share: %{y:.1f}%<extra></extra>",
             )
             fig_share_trend.update_layout(
                 **CHART_THEME, hovermode="x",
                 xaxis=dict(**AXIS_STYLE), yaxis=dict(title="AUM Share (%)", **AXIS_STYLE),
                 legend=dict(font=dict(size=11)),
             )
-            st.plotly_chart(fig_share_trend, use_container_width=True)
+            st.plotly_chart(fig_share_trend, use_container_width=True, config=PLOTLY_CONFIG)
+
+
+with tab2:
+    render_amc_tab(df_all, period, categories, latest_month)
 
 
 # ═══════════════════════════════════════════════════════════════════════
 # TAB 3 — AMC DEEP-DIVE & SCHEME TYPE
 # ═══════════════════════════════════════════════════════════════════════
-with tab3:
+@st.fragment
+def render_deep_dive_tab(df_all, period, categories, latest_month, latest_month_lbl,
+                         latest_month_date_str, selected_period_months, cfy):
+    """Tab 3 body. A fragment, so AMC / scheme-type picks rerun only this tab."""
     col_amc, col_sch = st.columns(2)
     with col_amc:
         all_amcs = sorted(df_all["amc"].unique())
@@ -990,7 +1145,11 @@ with tab3:
         st.warning(f"No data for {sel_amc} / {sel_subcat}.")
     else:
         # ── AMC KPIs ──────────────────────────────────────────────
-        df_amc_latest = aggregate_period_schemes(df_amc, selected_period_months)
+        df_amc_latest = amc_period_schemes(
+            df_all, categories, sel_amc,
+            None if sel_subcat == "All Scheme Types" else sel_subcat,
+            selected_period_months,
+        )
         amc_flow = df_amc_latest["net_flow_cr"].sum()
         amc_aum = df_amc_latest["aum_cur_cr"].sum()
         amc_n = df_amc_latest["scheme_name"].nunique()
@@ -1032,19 +1191,22 @@ with tab3:
             unsafe_allow_html=True,
         )
 
-        amc_period = agg_by_period(df_amc, period)
+        amc_period = period_agg(
+            period, categories, latest_month, amc=sel_amc,
+            sub_category=None if sel_subcat == "All Scheme Types" else sel_subcat,
+        )
         if not amc_period.empty and len(amc_period) > 0:
             fig_amc_ts = make_subplots(specs=[[{"secondary_y": True}]])
-            fc = [COLOR_POS if v >= 0 else COLOR_NEG for v in amc_period["net_flow_cr"]]
+            fc = np.where(amc_period["net_flow_cr"] >= 0, COLOR_POS, COLOR_NEG)
             fig_amc_ts.add_trace(go.Bar(
-                x=amc_period["period_label"], y=amc_period["net_flow_cr"],
+                x=amc_period["period_label"].to_numpy(), y=amc_period["net_flow_cr"].to_numpy(),
                 marker_color=fc, opacity=0.85, name="Net Flow",
-                text=[fmt_cr(v) for v in amc_period["net_flow_cr"]],
-                textposition="outside", textfont=dict(size=10),
+                text=fmt_cr_vec(amc_period["net_flow_cr"]),
+                textposition=bar_text_position(len(amc_period)), textfont=dict(size=10),
                 hovertemplate="Flow: \u20b9%{y:,.0f} Cr<extra></extra>",
             ), secondary_y=False)
             fig_amc_ts.add_trace(go.Scatter(
-                x=amc_period["period_label"], y=amc_period["flow_pct"],
+                x=amc_period["period_label"].to_numpy(), y=amc_period["flow_pct"].to_numpy(),
                 name="Flow/AUM %", line=dict(color="#7c3aed", width=2.5),
                 mode="lines+markers", marker=dict(size=5),
                 hovertemplate="Flow/AUM: %{y:+.1f}%<extra></extra>",
@@ -1058,7 +1220,7 @@ with tab3:
                 yaxis2=dict(title="Flow/AUM %", gridcolor="rgba(0,0,0,0)",
                             ticksuffix="%"),
             )
-            st.plotly_chart(fig_amc_ts, use_container_width=True)
+            st.plotly_chart(fig_amc_ts, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── AMC AUM Time-Series ──────────────────────────────────
         st.markdown(
@@ -1068,18 +1230,18 @@ with tab3:
 
         if not amc_period.empty and len(amc_period) > 0:
             amc_aum_ts = compute_yoy_growth(amc_period)
-            aum_labels_amc = [fmt_cr(v) for v in amc_aum_ts["aum_cr"]]
+            aum_labels_amc = fmt_cr_vec(amc_aum_ts["aum_cr"])
 
             fig_amc_aum = make_subplots(specs=[[{"secondary_y": True}]])
             fig_amc_aum.add_trace(go.Bar(
-                x=amc_aum_ts["period_label"], y=amc_aum_ts["aum_cr"],
+                x=amc_aum_ts["period_label"].to_numpy(), y=amc_aum_ts["aum_cr"].to_numpy(),
                 name="AUM", marker_color=COLOR_AUM, opacity=0.85,
-                text=aum_labels_amc, textposition="outside", textfont=dict(size=10),
+                text=aum_labels_amc, textposition=bar_text_position(len(amc_aum_ts)), textfont=dict(size=10),
                 hovertemplate="AUM: \u20b9%{y:,.0f} Cr<extra></extra>",
             ), secondary_y=False)
 
             fig_amc_aum.add_trace(go.Scatter(
-                x=amc_aum_ts["period_label"], y=amc_aum_ts["yoy_pct"],
+                x=amc_aum_ts["period_label"].to_numpy(), y=amc_aum_ts["yoy_pct"].to_numpy(),
                 name="YoY AUM Growth %", line=dict(color="#f59e0b", width=2.5),
                 mode="lines+markers", marker=dict(size=5), connectgaps=True,
                 hovertemplate="YoY: %{y:+.1f}%<extra></extra>",
@@ -1093,12 +1255,12 @@ with tab3:
                 yaxis2=dict(title="YoY Growth (%)", gridcolor="rgba(0,0,0,0)",
                             ticksuffix="%"),
             )
-            st.plotly_chart(fig_amc_aum, use_container_width=True)
+            st.plotly_chart(fig_amc_aum, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── Which AMCs doing well in this scheme type? ────────────
         if sel_subcat != "All Scheme Types":
-            df_subcat = df_all[df_all["sub_category"] == sel_subcat]
-            subcat_amc_agg = agg_by_period(df_subcat, period, extra_group=["amc"])
+            subcat_amc_agg = period_agg(period, categories, latest_month,
+                                        extra_group=("amc",), sub_category=sel_subcat)
 
             if not subcat_amc_agg.empty:
                 # Latest period ranking
@@ -1115,11 +1277,10 @@ with tab3:
                 st.caption(f"Data as of {latest_month_date_str}")
 
                 fig_subcat_rank = go.Figure(go.Bar(
-                    x=sp_latest["net_flow_cr"], y=sp_latest["amc"],
+                    x=sp_latest["net_flow_cr"].to_numpy(), y=sp_latest["amc"].to_numpy(),
                     orientation="h",
-                    marker_color=[COLOR_POS if v >= 0 else COLOR_NEG
-                                  for v in sp_latest["net_flow_cr"]],
-                    text=[fmt_cr(v) for v in sp_latest["net_flow_cr"]],
+                    marker_color=np.where(sp_latest["net_flow_cr"] >= 0, COLOR_POS, COLOR_NEG),
+                    text=fmt_cr_vec(sp_latest["net_flow_cr"]),
                     textposition="outside", textfont=dict(size=10), cliponaxis=False,
                     hovertemplate="<b>%{y}</b>: \u20b9%{x:,.0f} Cr<extra></extra>",
                 ))
@@ -1129,27 +1290,23 @@ with tab3:
                     xaxis=dict(title="Net Flow (\u20b9 Cr)", **AXIS_STYLE),
                     yaxis=dict(tickfont=dict(size=10), **AXIS_STYLE),
                 )
-                st.plotly_chart(fig_subcat_rank, use_container_width=True)
+                st.plotly_chart(fig_subcat_rank, use_container_width=True, config=PLOTLY_CONFIG)
 
                 # Time-series for top AMCs in this sub-category
                 if len(subcat_amc_agg["period_label"].unique()) > 1:
                     top_in_cat = (
-                        subcat_amc_agg.groupby("amc")["net_flow_cr"]
-                        .apply(lambda x: x.abs().sum())
+                        subcat_amc_agg.assign(abs_flow=subcat_amc_agg["net_flow_cr"].abs())
+                        .groupby("amc", observed=True)["abs_flow"].sum()
                         .nlargest(8).index.tolist()
                     )
                     cat_ts = subcat_amc_agg[
                         subcat_amc_agg["amc"].isin(top_in_cat)
                     ].sort_values("period_sort")
 
-                    fig_cat_amc_ts = px.line(
-                        cat_ts, x="period_label", y="net_flow_cr", color="amc",
-                        markers=True, height=420,
-                        labels={"net_flow_cr": "Net Flow (\u20b9 Cr)",
-                                "period_label": "", "amc": "AMC"},
-                    )
-                    fig_cat_amc_ts.update_traces(
-                        hovertemplate="<b>%{fullData.name}</b><br>\u20b9%{y:,.0f} Cr<extra></extra>"
+                    fig_cat_amc_ts = gl_lines(
+                        cat_ts, "period_label", "net_flow_cr", "amc", height=420,
+                        y_title="Net Flow (\u20b9 Cr)",
+                        hovertemplate="<b>%{fullData.name}</b><br>\u20b9%{y:,.0f} Cr<extra></extra>",
                     )
                     fig_cat_amc_ts.add_hline(y=0, line_dash="dash",
                                               line_color="#9ca3af", line_width=1)
@@ -1159,7 +1316,7 @@ with tab3:
                         yaxis=dict(**AXIS_STYLE),
                         legend=dict(font=dict(size=10)),
                     )
-                    st.plotly_chart(fig_cat_amc_ts, use_container_width=True)
+                    st.plotly_chart(fig_cat_amc_ts, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── Category Breakdown (if showing all scheme types) ──────
         if sel_subcat == "All Scheme Types" and not df_amc_latest.empty:
@@ -1169,16 +1326,16 @@ with tab3:
                 unsafe_allow_html=True,
             )
             st.caption(f"Data as of {latest_month_date_str}")
-            amc_cat = (
-                df_amc_latest.groupby("sub_category")
-                .agg(net_flow=("net_flow_cr", "sum"), aum=("aum_cur_cr", "sum"))
-                .reset_index().sort_values("net_flow")
+            amc_cat = amc_category_flows(
+                sel_amc,
+                tuple(pd.Timestamp(m).strftime("%Y-%m-%d") for m in selected_period_months),
+                categories,
             )
             fig_ac = go.Figure(go.Bar(
-                x=amc_cat["net_flow"], y=amc_cat["sub_category"],
+                x=amc_cat["net_flow"].to_numpy(), y=amc_cat["sub_category"].to_numpy(),
                 orientation="h",
-                marker_color=[COLOR_POS if v >= 0 else COLOR_NEG for v in amc_cat["net_flow"]],
-                text=[fmt_cr(v) for v in amc_cat["net_flow"]],
+                marker_color=np.where(amc_cat["net_flow"] >= 0, COLOR_POS, COLOR_NEG),
+                text=fmt_cr_vec(amc_cat["net_flow"]),
                 textposition="outside", textfont=dict(size=11), cliponaxis=False,
                 hovertemplate="<b>%{y}</b>: \u20b9%{x:,.0f} Cr<extra></extra>",
             ))
@@ -1188,7 +1345,7 @@ with tab3:
                 xaxis=dict(title="Net Flow (\u20b9 Cr)", **AXIS_STYLE),
                 yaxis=dict(tickfont=dict(size=11), **AXIS_STYLE),
             )
-            st.plotly_chart(fig_ac, use_container_width=True)
+            st.plotly_chart(fig_ac, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── AUM Split by Category ─────────────────────────────────
         if sel_subcat == "All Scheme Types" and not df_amc_latest.empty:
@@ -1200,7 +1357,7 @@ with tab3:
             st.caption(f"Data as of {latest_month_date_str}")
 
             aum_by_cat = (
-                df_amc_latest.groupby("sub_category")
+                df_amc_latest.groupby("sub_category", observed=True)
                 .agg(aum=("aum_cur_cr", "sum"), flow=("net_flow_cr", "sum"))
                 .reset_index().sort_values("aum", ascending=False)
             )
@@ -1228,12 +1385,12 @@ with tab3:
                         font=dict(color="#1f2937"),
                     )],
                 )
-                st.plotly_chart(fig_donut, use_container_width=True)
+                st.plotly_chart(fig_donut, use_container_width=True, config=PLOTLY_CONFIG)
 
             with col_bar:
                 aum_sorted = aum_by_cat.sort_values("aum")
                 fig_aum_cat_bar = go.Figure(go.Bar(
-                    x=aum_sorted["aum"], y=aum_sorted["sub_category"],
+                    x=aum_sorted["aum"].to_numpy(), y=aum_sorted["sub_category"].to_numpy(),
                     orientation="h", marker_color=COLOR_AUM, opacity=0.85,
                     text=[f"{fmt_cr(a)} ({s:.1f}%)" for a, s in
                           zip(aum_sorted["aum"], aum_sorted["share"])],
@@ -1246,7 +1403,7 @@ with tab3:
                     xaxis=dict(title="AUM (₹ Cr)", **AXIS_STYLE),
                     yaxis=dict(tickfont=dict(size=10), **AXIS_STYLE),
                 )
-                st.plotly_chart(fig_aum_cat_bar, use_container_width=True)
+                st.plotly_chart(fig_aum_cat_bar, use_container_width=True, config=PLOTLY_CONFIG)
 
             # ── Category AUM Summary Table ────────────────────────
             cat_summary = aum_by_cat.copy()
@@ -1290,17 +1447,15 @@ with tab3:
             if sel_subcat == "All Scheme Types":
                 with col_cat_ts:
                     st.markdown("**Category-wise AUM Mix**")
-                    cat_ts = (
-                        df_amc.groupby(["month_end", "sub_category"])
-                        .agg(aum=("aum_cur_cr", "sum"))
-                        .reset_index()
-                    )
+                    cat_ts = amc_monthly(sel_amc, categories)[
+                        ["month_end", "sub_category", "aum_cr"]
+                    ].rename(columns={"aum_cr": "aum"})
                     top_cats = _top_contributors(cat_ts, "sub_category")
                     cat_ts["display"] = cat_ts["sub_category"].apply(
                         lambda x: x if x in top_cats else "Others"
                     )
                     cat_ts_agg = (
-                        cat_ts.groupby(["month_end", "display"])
+                        cat_ts.groupby(["month_end", "display"], observed=True)
                         .agg(aum=("aum", "sum")).reset_index()
                     )
                     mt = cat_ts_agg.groupby("month_end")["aum"].transform("sum")
@@ -1318,7 +1473,7 @@ with tab3:
                     for i, cat in enumerate(cat_order):
                         sub = cat_ts_agg[cat_ts_agg["display"] == cat].sort_values("month_end")
                         fig_cat_s.add_trace(go.Bar(
-                            x=sub["month_lbl"], y=sub["pct"], name=cat,
+                            x=sub["month_lbl"].to_numpy(), y=sub["pct"].to_numpy(), name=cat,
                             marker_color=(
                                 palette_s[i % len(palette_s)]
                                 if cat != "Others" else "#d1d5db"
@@ -1345,13 +1500,13 @@ with tab3:
                         ),
                         margin=dict(b=80),
                     )
-                    st.plotly_chart(fig_cat_s, use_container_width=True)
+                    st.plotly_chart(fig_cat_s, use_container_width=True, config=PLOTLY_CONFIG)
 
             # ─── Scheme-wise 100% stacked bar ───
             with col_sch_ts:
                 st.markdown("**Scheme-wise AUM Mix**")
                 sch_ts = (
-                    df_amc.groupby(["month_end", "scheme_name"])
+                    df_amc.groupby(["month_end", "scheme_name"], observed=True)
                     .agg(aum=("aum_cur_cr", "sum"))
                     .reset_index()
                 )
@@ -1367,7 +1522,7 @@ with tab3:
                     lambda x: scheme_short.get(x, x) if x in top_schemes else "Others"
                 )
                 sch_ts_agg = (
-                    sch_ts.groupby(["month_end", "display"])
+                    sch_ts.groupby(["month_end", "display"], observed=True)
                     .agg(aum=("aum", "sum")).reset_index()
                 )
                 mt_s = sch_ts_agg.groupby("month_end")["aum"].transform("sum")
@@ -1385,7 +1540,7 @@ with tab3:
                 for i, sch in enumerate(sch_order):
                     sub = sch_ts_agg[sch_ts_agg["display"] == sch].sort_values("month_end")
                     fig_sch_s.add_trace(go.Bar(
-                        x=sub["month_lbl"], y=sub["pct"], name=sch,
+                        x=sub["month_lbl"].to_numpy(), y=sub["pct"].to_numpy(), name=sch,
                         marker_color=(
                             palette_p[i % len(palette_p)]
                             if sch != "Others" else "#d1d5db"
@@ -1412,7 +1567,7 @@ with tab3:
                     ),
                     margin=dict(b=80),
                 )
-                st.plotly_chart(fig_sch_s, use_container_width=True)
+                st.plotly_chart(fig_sch_s, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── Top Schemes by AUM ────────────────────────────────────
         if not df_amc_latest.empty:
@@ -1423,15 +1578,13 @@ with tab3:
             )
             st.caption(f"Data as of {latest_month_date_str}")
 
+            amc_total_aum = df_amc_latest["aum_cur_cr"].sum()
             top_aum_schemes = df_amc_latest.nlargest(15, "aum_cur_cr")[
                 ["scheme_name", "sub_category", "aum_cur_cr", "net_flow_cr"]
-            ].copy()
-            top_aum_schemes["short"] = top_aum_schemes["scheme_name"].apply(
-                lambda s: s.split(" ", 2)[-1] if " " in s else s
+            ].assign(
+                short=lambda d: d["scheme_name"].str.split(" ", n=2).str[-1],
+                aum_share=lambda d: (d["aum_cur_cr"] / amc_total_aum * 100).round(1),
             )
-            top_aum_schemes["aum_share"] = (
-                top_aum_schemes["aum_cur_cr"] / df_amc_latest["aum_cur_cr"].sum() * 100
-            ).round(1)
 
             sorted_aum_sch = top_aum_schemes.sort_values("aum_cur_cr")
             palette_cats = px.colors.qualitative.Set2
@@ -1439,7 +1592,7 @@ with tab3:
             cat_color_map = {c: palette_cats[i % len(palette_cats)] for i, c in enumerate(cat_list)}
 
             fig_top_aum = go.Figure(go.Bar(
-                x=sorted_aum_sch["aum_cur_cr"], y=sorted_aum_sch["short"],
+                x=sorted_aum_sch["aum_cur_cr"].to_numpy(), y=sorted_aum_sch["short"].to_numpy(),
                 orientation="h",
                 marker_color=[cat_color_map.get(c, COLOR_AUM) for c in sorted_aum_sch["sub_category"]],
                 opacity=0.85,
@@ -1461,7 +1614,7 @@ with tab3:
                 xaxis=dict(title="AUM (₹ Cr)", **AXIS_STYLE),
                 yaxis=dict(tickfont=dict(size=10), **AXIS_STYLE),
             )
-            st.plotly_chart(fig_top_aum, use_container_width=True)
+            st.plotly_chart(fig_top_aum, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── AUM Treemap (Category → Scheme) ───────────────────────
         if sel_subcat == "All Scheme Types" and not df_amc_latest.empty:
@@ -1479,9 +1632,7 @@ with tab3:
                     (tree_df["net_flow_cr"] / tree_df["aum_cur_cr"] * 100).clip(-20, 20),
                     0,
                 )
-                tree_df["short"] = tree_df["scheme_name"].apply(
-                    lambda s: s.split(" ", 2)[-1] if " " in s else s
-                )
+                tree_df["short"] = tree_df["scheme_name"].str.split(" ", n=2).str[-1]
                 fig_tree = px.treemap(
                     tree_df, path=["sub_category", "short"],
                     values="aum_cur_cr", color="flow_pct_tree",
@@ -1500,74 +1651,66 @@ with tab3:
                         "Flow %: %{color:+.1f}%<extra></extra>"
                     ),
                 )
-                st.plotly_chart(fig_tree, use_container_width=True)
+                st.plotly_chart(fig_tree, use_container_width=True, config=PLOTLY_CONFIG)
 
         # ── Top Schemes ───────────────────────────────────────────
         if not df_amc_latest.empty:
-            col_l, col_r = st.columns(2)
-            with col_l:
-                st.markdown(f"**\U0001f7e2 Top Inflow Schemes \u2014 {sel_amc} \u2014 {latest_month_lbl}**")
-                st.caption(f"Data as of {latest_month_date_str}")
-                df_positive = df_amc_latest[df_amc_latest["net_flow_cr"] > 0]
-                if df_positive.empty:
-                    st.info("No schemes with positive inflows this period.")
-                else:
-                    top_in = df_positive.nlargest(10, "net_flow_cr")[
-                        ["scheme_name", "net_flow_cr", "aum_cur_cr"]
-                    ].copy()
-                    top_in["short"] = top_in["scheme_name"].apply(
-                        lambda s: s.split(" ", 2)[-1] if " " in s else s
-                    )
-                    sorted_in = top_in.sort_values("net_flow_cr")
-                    fig_in = go.Figure(go.Bar(
-                        x=sorted_in["net_flow_cr"], y=sorted_in["short"],
-                        orientation="h", marker_color=COLOR_POS,
-                        text=[fmt_cr(v) for v in sorted_in["net_flow_cr"]],
+            top_args = (sel_amc,
+                        tuple(pd.Timestamp(m).strftime("%Y-%m-%d") for m in selected_period_months),
+                        None if sel_subcat == "All Scheme Types" else sel_subcat,
+                        categories)
+            top_in = amc_top_flows(*top_args, largest=True)
+            top_out = amc_top_flows(*top_args, largest=False)
+            st.markdown(f"**Top Inflow & Outflow Schemes \u2014 {sel_amc} \u2014 {latest_month_lbl}**")
+            st.caption(f"Data as of {latest_month_date_str}")
+            if top_in.empty and top_out.empty:
+                st.info("No schemes with inflows or outflows this period.")
+            else:
+                # One figure, outflow axis mirrored to the right so the two
+                # sets of scheme names sit on the outer edges
+                fig_top = make_subplots(
+                    rows=1, cols=2, horizontal_spacing=0.15,
+                    subplot_titles=("\U0001f7e2 Top Inflows", "\U0001f534 Top Outflows"),
+                )
+                for col, top, ascending, color, empty_msg in (
+                    (1, top_in, True, COLOR_POS, "No schemes with positive inflows this period."),
+                    (2, top_out, False, COLOR_NEG, "No schemes with outflows this period."),
+                ):
+                    if top.empty:
+                        fig_top.add_annotation(
+                            text=empty_msg, showarrow=False, font=dict(size=12, color="#6b7280"),
+                            xref="x domain", yref="y domain", x=0.5, y=0.5, row=1, col=col,
+                        )
+                        fig_top.update_xaxes(visible=False, row=1, col=col)
+                        fig_top.update_yaxes(visible=False, row=1, col=col)
+                        continue
+                    top = top.sort_values("net_flow_cr", ascending=ascending)
+                    fig_top.add_trace(go.Bar(
+                        x=top["net_flow_cr"].to_numpy(),
+                        y=top["scheme_name"].str.split(" ", n=2).str[-1].to_numpy(),
+                        orientation="h", marker_color=color,
+                        text=fmt_cr_vec(top["net_flow_cr"]),
                         textposition="outside", textfont=dict(size=10), cliponaxis=False,
                         hovertemplate="<b>%{y}</b>: \u20b9%{x:,.0f} Cr<extra></extra>",
-                    ))
-                    fig_in.update_layout(
-                        height=380, **CHART_THEME, showlegend=False,
-                        margin=dict(r=80),
-                        xaxis=dict(**AXIS_STYLE),
-                        yaxis=dict(tickfont=dict(size=10), **AXIS_STYLE),
-                    )
-                    st.plotly_chart(fig_in, use_container_width=True)
+                    ), row=1, col=col)
+                fig_top.update_layout(height=380, **CHART_THEME, showlegend=False)
+                fig_top.update_xaxes(**AXIS_STYLE)
+                fig_top.update_yaxes(tickfont=dict(size=10), **AXIS_STYLE)
+                fig_top.update_yaxes(side="right", row=1, col=2)
+                st.plotly_chart(fig_top, use_container_width=True, config=PLOTLY_CONFIG)
 
-            with col_r:
-                st.markdown(f"**\U0001f534 Top Outflow Schemes \u2014 {sel_amc} \u2014 {latest_month_lbl}**")
-                st.caption(f"Data as of {latest_month_date_str}")
-                df_negative = df_amc_latest[df_amc_latest["net_flow_cr"] < 0]
-                if df_negative.empty:
-                    st.info("No schemes with outflows this period.")
-                else:
-                    top_out = df_negative.nsmallest(10, "net_flow_cr")[
-                        ["scheme_name", "net_flow_cr", "aum_cur_cr"]
-                    ].copy()
-                    top_out["short"] = top_out["scheme_name"].apply(
-                        lambda s: s.split(" ", 2)[-1] if " " in s else s
-                    )
-                    sorted_out = top_out.sort_values("net_flow_cr", ascending=False)
-                    fig_out = go.Figure(go.Bar(
-                        x=sorted_out["net_flow_cr"], y=sorted_out["short"],
-                        orientation="h", marker_color=COLOR_NEG,
-                        text=[fmt_cr(v) for v in sorted_out["net_flow_cr"]],
-                        textposition="outside", textfont=dict(size=10), cliponaxis=False,
-                        hovertemplate="<b>%{y}</b>: \u20b9%{x:,.0f} Cr<extra></extra>",
-                    ))
-                    fig_out.update_layout(
-                        height=380, **CHART_THEME, showlegend=False,
-                        margin=dict(l=80),
-                        xaxis=dict(**AXIS_STYLE),
-                        yaxis=dict(tickfont=dict(size=10), **AXIS_STYLE),
-                    )
-                    st.plotly_chart(fig_out, use_container_width=True)
+
+with tab3:
+    render_deep_dive_tab(df_all, period, categories, latest_month, latest_month_lbl,
+                         latest_month_date_str, selected_period_months, cfy)
 
 
 # ═══════════════════════════════════════════════════════════════════════
 # TAB 4 — RAW DATA
 # ═══════════════════════════════════════════════════════════════════════
-with tab4:
+@st.fragment
+def render_raw_data_tab(df_all):
+    """Tab 4 body. A fragment, so the CSV download reruns only this tab."""
     st.markdown(
         "<div class='section-header'>Full Data \u2014 All Months Loaded</div>",
         unsafe_allow_html=True,
@@ -1577,24 +1720,23 @@ with tab4:
         df_all.sort_values(["month_end", "net_flow_cr"], ascending=[False, False])
         [["month_lbl", "amc", "scheme_name", "category", "sub_category",
           "aum_cur_cr", "aum_prev_cr", "net_flow_cr", "flow_pct"]]
-        .copy()
     )
 
     show_df.columns = [
         "Month", "AMC", "Scheme", "Category", "Sub-Category",
         "AUM Cur (\u20b9Cr)", "AUM Prev (\u20b9Cr)", "Net Flow (\u20b9Cr)", "Flow %",
     ]
-    for col in ["AUM Cur (\u20b9Cr)", "AUM Prev (\u20b9Cr)", "Net Flow (\u20b9Cr)"]:
-        show_df[col] = show_df[col].apply(
-            lambda x: f"{x:,.0f}" if pd.notna(x) else "—")
-    show_df["Flow %"] = show_df["Flow %"].apply(
-        lambda x: f"{x:+.1f}%" if pd.notna(x) else "—"
-    )
+    cr_cols = ["AUM Cur (\u20b9Cr)", "AUM Prev (\u20b9Cr)", "Net Flow (\u20b9Cr)"]
+    show_df[cr_cols] = show_df[cr_cols].round(0)
 
-    st.dataframe(show_df, use_container_width=True, height=600)
+    # Values stay numeric; st.dataframe formats them client-side.
+    raw_cols = {c: st.column_config.NumberColumn(format="%.0f") for c in cr_cols}
+    raw_cols["Flow %"] = st.column_config.NumberColumn(format="%+.1f%%")
+    st.dataframe(show_df, use_container_width=True, height=600, column_config=raw_cols)
 
-    csv = show_df.to_csv(index=False)
-    st.download_button("\u2b07\ufe0f Download CSV", csv, "industry_flows.csv", "text/csv")
+    # Built only when clicked (deferred), then served from cache
+    st.download_button("\u2b07\ufe0f Download CSV", lambda: raw_csv_bytes(show_df),
+                       "industry_flows.csv", "text/csv")
 
 
 # ── Footer ───────────────────────────────────────────────────────────────────
@@ -1604,3 +1746,8 @@ st.caption(
     "Flows = Actual AUM \u2212 (Prior AUM \u00d7 NAV Return)  \u2022  "
     "Regular Plan Growth NAV used as MTM benchmark"
 )
+
+
+with tab4:
+    render_raw_data_tab(df_all)
+
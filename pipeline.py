@@ -15,9 +15,15 @@ import os
 import sqlite3
 import logging
 import time
+import threading
 import requests
+import numpy as np
 import pandas as pd
-from datetime import date, datetime, timedelta
+from pandas.tseries.offsets import BDay, BMonthEnd
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
@@ -44,6 +50,26 @@ API_HEADERS = {
     "sec-fetch-site": "same-origin",
 }
 
+# Concurrent sub-category requests per report date, and one keep-alive
+# session (pool sized to match) shared by those threads. The report endpoints
+# are read-only queries, so POSTs are safe to retry on throttling/gateway errors.
+FETCH_WORKERS = 6
+# Months the dashboard's historical load runs at once; each runs its own
+# FETCH_WORKERS. _API_SLOTS caps in-flight POSTs across all of them.
+MONTH_WORKERS = 2
+_API_SLOTS = threading.BoundedSemaphore(FETCH_WORKERS * MONTH_WORKERS)
+API_RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 502, 503, 504),
+    allowed_methods=frozenset({"POST"}),
+)
+_SESSION = requests.Session()
+_SESSION.headers.update(API_HEADERS)
+_SESSION.mount("https://", HTTPAdapter(pool_connections=FETCH_WORKERS,
+                                       pool_maxsize=FETCH_WORKERS * MONTH_WORKERS,
+                                       max_retries=API_RETRY))
+
 # ICICI Prudential Mutual Fund ID in the AMFI system
 ICICI_MF_ID = 17
 
@@ -97,6 +123,8 @@ def init_db():
     con = sqlite3.connect(DB_PATH)
     cur = con.cursor()
     cur.executescript("""
+        PRAGMA journal_mode = WAL;
+
         CREATE TABLE IF NOT EXISTS monthly_snapshots (
             scheme_name     TEXT,
             category        TEXT,       -- 'Equity' or 'Hybrid'
@@ -125,6 +153,11 @@ def init_db():
             PRIMARY KEY (scheme_name, month_end)
         );
 
+        CREATE INDEX IF NOT EXISTS idx_monthly_flows_month
+            ON monthly_flows (month_end);
+        CREATE INDEX IF NOT EXISTS idx_monthly_flows_subcat_month
+            ON monthly_flows (sub_category, month_end);
+
         CREATE TABLE IF NOT EXISTS pipeline_log (
             run_at          TEXT,
             month_processed TEXT,
@@ -146,7 +179,8 @@ def _api_post(endpoint: str, payload: dict) -> dict:
     """POST to the AMFI-CRISIL API and return parsed JSON."""
     url = API_BASE + endpoint
     try:
-        resp = requests.post(url, headers=API_HEADERS, json=payload, timeout=60)
+        with _API_SLOTS:
+            resp = _SESSION.post(url, json=payload, timeout=60)
         resp.raise_for_status()
         data = resp.json()
         if data.get("validationMsg") != "SUCCESS":
@@ -158,21 +192,22 @@ def _api_post(endpoint: str, payload: dict) -> dict:
         return {}
 
 
+def _api_date(ts: pd.Timestamp) -> str:
+    """Format a date as the API's 'dd-MMM-yyyy' (locale-independent)."""
+    return ts.strftime(f"%d-{MONTH_ABBR[ts.month]}-%Y")
+
+
 def get_last_business_day(year: int, month: int) -> str:
     """
-    Returns the last business day of the given month as 'dd-MMM-yyyy'.
-    Walks backward from the last calendar day, skipping Sat/Sun.
+    Returns the last business day (Mon-Fri) of the given month as 'dd-MMM-yyyy'.
     """
-    if month == 12:
-        last_day = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        last_day = date(year, month + 1, 1) - timedelta(days=1)
+    return _api_date(pd.Timestamp(year, month, 1) + BMonthEnd(0))
 
-    # Walk back to a weekday
-    while last_day.weekday() >= 5:  # 5=Sat, 6=Sun
-        last_day -= timedelta(days=1)
 
-    return last_day.strftime(f"%d-{MONTH_ABBR[last_day.month]}-%Y")
+def previous_business_days(date_str: str, n: int = 4) -> list:
+    """The `n` weekdays before `date_str` ('dd-MMM-yyyy'), newest first, as holiday fallbacks."""
+    start = pd.Timestamp(datetime.strptime(date_str, "%d-%b-%Y"))
+    return [_api_date(start - BDay(k)) for k in range(1, n + 1)]
 
 
 def fetch_schemes_for_date(report_date: str, category_id: int,
@@ -212,25 +247,20 @@ def fetch_schemes_for_date(report_date: str, category_id: int,
 def fetch_all_schemes_for_date(report_date: str) -> pd.DataFrame:
     """
     Fetches all ICICI Pru equity + hybrid schemes for a given date.
-    Iterates over all sub-categories.
+    Sub-categories are fetched concurrently (FETCH_WORKERS at a time).
     """
-    all_rows = []
-
-    # Equity sub-categories
-    for subcat_id, subcat_name in EQUITY_SUBCATEGORIES.items():
-        log.info("  Fetching Equity > %s for %s ...", subcat_name, report_date)
-        rows = fetch_schemes_for_date(report_date, CATEGORY_EQUITY,
-                                      subcat_id, subcat_name, "Equity")
-        all_rows.extend(rows)
-        time.sleep(0.3)  # Be polite to the API
-
-    # Hybrid sub-categories
-    for subcat_id, subcat_name in HYBRID_SUBCATEGORIES.items():
-        log.info("  Fetching Hybrid > %s for %s ...", subcat_name, report_date)
-        rows = fetch_schemes_for_date(report_date, CATEGORY_HYBRID,
-                                      subcat_id, subcat_name, "Hybrid")
-        all_rows.extend(rows)
-        time.sleep(0.3)
+    tasks = ([(CATEGORY_EQUITY, sid, name, "Equity") for sid, name in EQUITY_SUBCATEGORIES.items()]
+             + [(CATEGORY_HYBRID, sid, name, "Hybrid") for sid, name in HYBRID_SUBCATEGORIES.items()])
+
+    def fetch(task):
+        category_id, subcat_id, subcat_name, category_label = task
+        log.info("  Fetching %s > %s for %s ...", category_label, subcat_name, report_date)
+        return fetch_schemes_for_date(report_date, category_id,
+                                      subcat_id, subcat_name, category_label)
+
+    # Sub-categories are independent requests; map() keeps them in task order
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as ex:
+        all_rows = [row for rows in ex.map(fetch, tasks) for row in rows]
 
     df = pd.DataFrame(all_rows)
     if not df.empty:
@@ -244,23 +274,35 @@ def fetch_all_schemes_for_date(report_date: str) -> pd.DataFrame:
 # SNAPSHOT STORAGE
 # ─────────────────────────────────────────────
 
-def store_snapshot(df: pd.DataFrame, month_end_iso: str):
-    """Store month-end snapshot into monthly_snapshots table."""
+def store_snapshot(df: pd.DataFrame, month_end_iso: str, con=None):
+    """Store month-end snapshot into monthly_snapshots table.
+
+    Pass ``con`` to write on the caller's connection; the caller then owns
+    the commit and close.
+    """
     if df.empty:
         return
 
-    con = sqlite3.connect(DB_PATH)
+    own_con = con is None
+    if own_con:
+        con = sqlite3.connect(DB_PATH)
+        con.execute("PRAGMA synchronous = NORMAL")
 
     # Delete existing records for this month_end first to avoid PK conflicts
     con.execute("DELETE FROM monthly_snapshots WHERE month_end = ?", (month_end_iso,))
 
     df_store = df[["scheme_name", "category", "sub_category",
-                    "nav_regular", "nav_direct", "daily_aum_cr"]].copy()
-    df_store["month_end"] = month_end_iso
-
-    df_store.to_sql("monthly_snapshots", con, if_exists="append", index=False)
-    con.commit()
-    con.close()
+                    "nav_regular", "nav_direct", "daily_aum_cr"]].assign(month_end=month_end_iso)
+    df_store = df_store.astype(object).where(df_store.notna(), None)
+
+    con.executemany("""
+        INSERT INTO monthly_snapshots
+            (scheme_name, category, sub_category, nav_regular, nav_direct, daily_aum_cr, month_end)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, df_store.itertuples(index=False, name=None))
+    if own_con:
+        con.commit()
+        con.close()
     log.info("Stored %d snapshot records for %s", len(df_store), month_end_iso)
 
 
@@ -268,10 +310,11 @@ def store_snapshot(df: pd.DataFrame, month_end_iso: str):
 # FLOW COMPUTATION
 # ─────────────────────────────────────────────
 
-def compute_flows_for_month(year: int, month: int):
+def compute_flows_for_month(year: int, month: int) -> bool:
     """
     Main entry point: fetches month-end data for the given month and the
     previous month, computes net flows, stores everything.
+    Returns False when the run is logged as FAILED (no data / no matches).
     """
     init_db()
 
@@ -292,11 +335,7 @@ def compute_flows_for_month(year: int, month: int):
 
     if df_cur.empty:
         # Try walking back a couple of days (holidays)
-        for offset in range(1, 5):
-            dt = datetime.strptime(cur_date_str, "%d-%b-%Y") - timedelta(days=offset)
-            while dt.weekday() >= 5:
-                dt -= timedelta(days=1)
-            alt_date = dt.strftime(f"%d-{MONTH_ABBR[dt.month]}-%Y")
+        for alt_date in previous_business_days(cur_date_str):
             log.info("  Retrying with %s ...", alt_date)
             df_cur = fetch_all_schemes_for_date(alt_date)
             if not df_cur.empty:
@@ -307,18 +346,14 @@ def compute_flows_for_month(year: int, month: int):
         msg = f"No data available for current month ({cur_date_str})"
         log.error(msg)
         _log_run(cur_date_str, 0, "FAILED", msg)
-        return
+        return False
 
     # Fetch previous month data
     log.info("Fetching previous month data (%s) ...", prev_date_str)
     df_prev = fetch_all_schemes_for_date(prev_date_str)
 
     if df_prev.empty:
-        for offset in range(1, 5):
-            dt = datetime.strptime(prev_date_str, "%d-%b-%Y") - timedelta(days=offset)
-            while dt.weekday() >= 5:
-                dt -= timedelta(days=1)
-            alt_date = dt.strftime(f"%d-{MONTH_ABBR[dt.month]}-%Y")
+        for alt_date in previous_business_days(prev_date_str):
             log.info("  Retrying with %s ...", alt_date)
             df_prev = fetch_all_schemes_for_date(alt_date)
             if not df_prev.empty:
@@ -329,16 +364,12 @@ def compute_flows_for_month(year: int, month: int):
         msg = f"No data available for previous month ({prev_date_str})"
         log.error(msg)
         _log_run(cur_date_str, 0, "FAILED", msg)
-        return
+        return False
 
     # Parse actual date used
     cur_date_iso = datetime.strptime(cur_date_str, "%d-%b-%Y").strftime("%Y-%m-%d")
     prev_date_iso = datetime.strptime(prev_date_str, "%d-%b-%Y").strftime("%Y-%m-%d")
 
-    # Store snapshots
-    store_snapshot(df_cur, cur_date_iso)
-    store_snapshot(df_prev, prev_date_iso)
-
     # Merge current and previous month
     merged = df_cur.merge(
         df_prev[["scheme_name", "nav_regular", "daily_aum_cr"]],
@@ -347,12 +378,6 @@ def compute_flows_for_month(year: int, month: int):
         suffixes=("_cur", "_prev"),
     )
 
-    if merged.empty:
-        msg = "No matching schemes between current and previous month"
-        log.error(msg)
-        _log_run(cur_date_iso, 0, "FAILED", msg)
-        return
-
     # Rename for clarity
     merged = merged.rename(columns={
         "nav_regular_cur": "nav_cur",
@@ -361,84 +386,101 @@ def compute_flows_for_month(year: int, month: int):
         "daily_aum_cr_prev": "aum_prev_cr",
     })
 
-    # Compute flows
-    merged["nav_return"] = merged["nav_cur"] / merged["nav_prev"]
-    merged["expected_aum_cr"] = merged["aum_prev_cr"] * merged["nav_return"]
-    merged["net_flow_cr"] = merged["aum_cur_cr"] - merged["expected_aum_cr"]
-    merged["flow_pct"] = (merged["net_flow_cr"] / merged["aum_prev_cr"]) * 100
+    # Compute flows on the raw arrays, then attach all four columns at once
+    nav_cur = merged["nav_cur"].to_numpy(dtype=np.float64)
+    nav_prev = merged["nav_prev"].to_numpy(dtype=np.float64)
+    aum_cur = merged["aum_cur_cr"].to_numpy(dtype=np.float64)
+    aum_prev = merged["aum_prev_cr"].to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        nav_return = nav_cur / nav_prev
+        expected_aum = aum_prev * nav_return
+        net_flow = aum_cur - expected_aum
+        flow_pct = net_flow / aum_prev * 100
+    merged = merged.assign(
+        nav_return=nav_return,
+        expected_aum_cr=expected_aum,
+        net_flow_cr=net_flow,
+        flow_pct=flow_pct,
+    )
 
     # Store flows
-    con = sqlite3.connect(DB_PATH)
-    flow_records = []
-    for _, row in merged.iterrows():
-        if pd.isna(row.get("net_flow_cr")):
-            continue
-        flow_records.append({
-            "scheme_name": row["scheme_name"],
-            "category": row["category"],
-            "sub_category": row["sub_category"],
-            "month_end": cur_date_iso,
-            "prev_month_end": prev_date_iso,
-            "nav_cur": row["nav_cur"],
-            "nav_prev": row["nav_prev"],
-            "nav_return": row["nav_return"],
-            "aum_cur_cr": row["aum_cur_cr"],
-            "aum_prev_cr": row["aum_prev_cr"],
-            "expected_aum_cr": row["expected_aum_cr"],
-            "net_flow_cr": row["net_flow_cr"],
-            "flow_pct": row["flow_pct"],
-        })
-
-    if flow_records:
-        flow_df = pd.DataFrame(flow_records)
+    flow_df = merged.dropna(subset=["net_flow_cr"]).assign(
+        month_end=cur_date_iso, prev_month_end=prev_date_iso,
+    )[["scheme_name", "category", "sub_category", "month_end", "prev_month_end",
+       "nav_cur", "nav_prev", "nav_return", "aum_cur_cr", "aum_prev_cr",
+       "expected_aum_cr", "net_flow_cr", "flow_pct"]]
 
-        # Delete existing records for this month to avoid PK conflicts on re-run
-        con.execute("DELETE FROM monthly_flows WHERE month_end = ?", (cur_date_iso,))
-        con.commit()
-
-        flow_df.to_sql("monthly_flows", con, if_exists="append", index=False)
-        con.commit()
-
-    con.close()
+    # Snapshots, flows and the run log all go through one connection
+    con = sqlite3.connect(DB_PATH)
+    con.execute("PRAGMA synchronous = NORMAL")  # WAL-safe; skips the fsync per commit
+    try:
+        with con:
+            store_snapshot(df_cur, cur_date_iso, con=con)
+            store_snapshot(df_prev, prev_date_iso, con=con)
+
+            if merged.empty:
+                msg = "No matching schemes between current and previous month"
+                log.error(msg)
+                _log_run(cur_date_iso, 0, "FAILED", msg, con=con)
+                return False
+
+            if not flow_df.empty:
+                # Delete existing records for this month to avoid PK conflicts on re-run
+                con.execute("DELETE FROM monthly_flows WHERE month_end = ?", (cur_date_iso,))
+                rows = flow_df.astype(object).where(flow_df.notna(), None)
+                con.executemany(
+                    f"INSERT INTO monthly_flows ({', '.join(rows.columns)}) "
+                    f"VALUES ({', '.join('?' * len(rows.columns))})",
+                    rows.itertuples(index=False, name=None),
+                )
+
+            _log_run(cur_date_iso, len(flow_df), "SUCCESS", "", con=con)
+    finally:
+        con.close()
 
     log.info("═" * 60)
-    log.info("Stored %d flow records for %s", len(flow_records), cur_date_iso)
-    total_flow = sum(r["net_flow_cr"] for r in flow_records)
-    total_aum = sum(r["aum_cur_cr"] for r in flow_records)
+    log.info("Stored %d flow records for %s", len(flow_df), cur_date_iso)
+    total_flow = flow_df["net_flow_cr"].sum()
+    total_aum = flow_df["aum_cur_cr"].sum()
     log.info("  Total Net Flow: ₹%.0f Cr", total_flow)
     log.info("  Total AUM:      ₹%.0f Cr", total_aum)
     log.info("═" * 60)
-
-    _log_run(cur_date_iso, len(flow_records), "SUCCESS", "")
+    return True
 
 
-def _log_run(month_end: str, count: int, status: str, message: str):
-    con = sqlite3.connect(DB_PATH)
+def _log_run(month_end: str, count: int, status: str, message: str, con=None):
+    own_con = con is None
+    if own_con:
+        con = sqlite3.connect(DB_PATH)
     con.execute("""
         INSERT INTO pipeline_log (run_at, month_processed, schemes_updated, status, message)
         VALUES (?, ?, ?, ?, ?)
     """, (datetime.utcnow().isoformat(), month_end, count, status, message))
-    con.commit()
-    con.close()
+    if own_con:
+        con.commit()
+        con.close()
 
 
 # ─────────────────────────────────────────────
 # QUERY HELPERS (used by dashboard)
 # ─────────────────────────────────────────────
 
+DATE_COLS = ("month_end", "prev_month_end")
+
+
 def get_con():
     return sqlite3.connect(DB_PATH)
 
 
 def load_flows(months: int = 36) -> pd.DataFrame:
+    """Flows for the last `months` months, newest first."""
     con = get_con()
-    q = f"""
+    df = pd.read_sql("""
         SELECT *
         FROM monthly_flows
-        WHERE month_end >= date('now', '-{months} months')
+        WHERE month_end >= date('now', ?)
         ORDER BY month_end DESC
-    """
-    df = pd.read_sql(q, con)
+    """, con, params=(f"-{months} months",), parse_dates=DATE_COLS)
     con.close()
     return df
 
@@ -459,9 +501,16 @@ def load_pipeline_log() -> pd.DataFrame:
     return df
 
 
-def load_snapshots() -> pd.DataFrame:
+def load_snapshots(months: int = None) -> pd.DataFrame:
+    """Month-end snapshots, newest first; only the last `months` months if given."""
+    q = "SELECT * FROM monthly_snapshots"
+    params = []
+    if months is not None:
+        q += " WHERE month_end >= date('now', ?)"
+        params.append(f"-{months} months")
     con = get_con()
-    df = pd.read_sql("SELECT * FROM monthly_snapshots ORDER BY month_end DESC", con)
+    df = pd.read_sql(q + " ORDER BY month_end DESC", con, params=params,
+                     parse_dates=["month_end"])
     con.close()
     return df
 
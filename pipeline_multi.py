@@ -13,12 +13,21 @@ Database: data/mf_flows_industry.db (separate from the ICICI-only DB)
 
 import os
 import re
+import gzip
+import json
+import hashlib
 import sqlite3
 import logging
-import time
+import threading
 import requests
+import numpy as np
 import pandas as pd
-from datetime import date, datetime, timedelta
+from pandas.tseries.offsets import BDay, BMonthEnd
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
@@ -26,6 +35,12 @@ log = logging.getLogger(__name__)
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "data", "mf_flows_industry.db")
 
+# Past report dates don't change, so their API responses are kept on disk and
+# reused (backfill reruns, and each month's "previous month" fetch). Dates
+# within API_CACHE_MIN_AGE_DAYS of today always go to the API.
+API_CACHE_DIR = os.path.join(os.path.dirname(__file__), "data", "api_cache")
+API_CACHE_MIN_AGE_DAYS = 15
+
 # ─────────────────────────────────────────────
 # AMFI-CRISIL API CONFIGURATION
 # ─────────────────────────────────────────────
@@ -42,6 +57,27 @@ API_HEADERS = {
     ),
 }
 
+# Concurrent category x sub-category requests per report date, over one
+# keep-alive session (pool sized to match). Throttling and gateway errors are
+# retried with backoff instead of pacing every call with a sleep; the report
+# endpoints are read-only, so retrying POSTs is safe.
+FETCH_WORKERS = 8
+# Months fetched at once during --backfill; each runs its own FETCH_WORKERS.
+BACKFILL_WORKERS = 2
+# Seconds a connection waits on another month's write transaction before giving up
+DB_TIMEOUT = 30
+API_RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"POST"}),
+)
+_SESSION = requests.Session()
+_SESSION.headers.update(API_HEADERS)
+_SESSION.mount("https://", HTTPAdapter(pool_connections=FETCH_WORKERS,
+                                       pool_maxsize=FETCH_WORKERS * BACKFILL_WORKERS,
+                                       max_retries=API_RETRY))
+
 # mfid=0 means ALL AMCs
 SYSTEM_MFID = 0
 
@@ -130,22 +166,59 @@ AMC_PREFIXES = [
 ]
 
 
+_AMC_SHORT = dict(AMC_PREFIXES)
+# One anchored alternation over every prefix, longest first so the longest
+# known prefix wins, matched in a single C-level pass per scheme name
+_AMC_PREFIX_RE = re.compile(
+    "|".join(re.escape(p) for p in sorted(_AMC_SHORT, key=len, reverse=True))
+)
+
+
 def extract_amc(scheme_name: str) -> str:
     """Extract AMC short name from scheme name."""
-    for prefix, short in AMC_PREFIXES:
-        if scheme_name.startswith(prefix):
-            return short
-    return "Other"
+    m = _AMC_PREFIX_RE.match(scheme_name)
+    return _AMC_SHORT[m.group()] if m else "Other"
 
 
 # ─────────────────────────────────────────────
 # DATABASE
 # ─────────────────────────────────────────────
 
+def _connect():
+    """Open the industry DB with the connection-level PRAGMAs every caller wants."""
+    con = sqlite3.connect(DB_PATH, timeout=DB_TIMEOUT)
+    con.executescript("""
+        PRAGMA synchronous = NORMAL;    -- WAL-safe; skips the fsync per commit
+        PRAGMA cache_size = -65536;     -- 64 MiB page cache
+        PRAGMA mmap_size = 268435456;   -- 256 MiB; reads come from the OS page cache
+        PRAGMA temp_store = MEMORY;
+    """)
+    return con
+
+
+# Scheme rows summed per AMC x sub-category x month; the dashboard's period
+# roll-ups read this instead of industry_flows. Stored in its key order (no
+# secondary indexes) so the strings aren't kept twice.
+_MONTHLY_TABLE_SQL = """
+    CREATE TABLE industry_flows_monthly (
+        amc             TEXT,
+        category        TEXT,
+        sub_category    TEXT,
+        month_end       TEXT,
+        net_flow_cr     REAL,
+        aum_cr          REAL,
+        PRIMARY KEY (amc, category, sub_category, month_end)
+    ) WITHOUT ROWID
+"""
+
+
 def init_db():
+    """Create / migrate the industry DB. Pipeline-only; the dashboard never calls it."""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    con = sqlite3.connect(DB_PATH)
+    con = _connect()
     con.executescript("""
+        PRAGMA journal_mode = WAL;
+
         CREATE TABLE IF NOT EXISTS industry_flows (
             amc             TEXT,
             scheme_name     TEXT,
@@ -163,6 +236,13 @@ def init_db():
             PRIMARY KEY (amc, scheme_name, month_end)
         );
 
+        CREATE INDEX IF NOT EXISTS idx_industry_flows_month
+            ON industry_flows (month_end DESC, amc);
+        CREATE INDEX IF NOT EXISTS idx_industry_flows_cat_month
+            ON industry_flows (category, month_end);
+        CREATE INDEX IF NOT EXISTS idx_industry_flows_amc_month_flow
+            ON industry_flows (amc, month_end, net_flow_cr);
+
         CREATE TABLE IF NOT EXISTS pipeline_log (
             run_at          TEXT,
             month_processed TEXT,
@@ -170,38 +250,137 @@ def init_db():
             status          TEXT,
             message         TEXT
         );
+
+        CREATE INDEX IF NOT EXISTS idx_pipeline_log_run_at
+            ON pipeline_log (run_at DESC);
     """)
+    # Create the monthly table (or replace an older rowid copy) and fill it in
+    # one transaction, so a concurrent reader never finds it missing or empty
+    old = con.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'industry_flows_monthly'"
+    ).fetchone()
+    if old is None or "WITHOUT ROWID" not in old[0]:
+        con.execute("BEGIN")
+        if old:
+            con.execute("DROP TABLE industry_flows_monthly")
+        con.execute(_MONTHLY_TABLE_SQL)
+        refresh_monthly_agg(con)
     con.commit()
     con.close()
     log.info("Industry DB initialised at %s", DB_PATH)
 
 
+# The industry_flows_monthly rows, computed from industry_flows
+_MONTHLY_AGG_SQL = """
+    SELECT amc, category, sub_category, month_end,
+           SUM(net_flow_cr) AS net_flow_cr, SUM(aum_cur_cr) AS aum_cr
+    FROM industry_flows {where}
+    GROUP BY amc, category, sub_category, month_end
+"""
+
+
+def refresh_monthly_agg(con, month_end=None):
+    """Rebuild industry_flows_monthly for one month_end (all months if None)."""
+    where, params = ("WHERE month_end = ?", (month_end,)) if month_end else ("", ())
+    con.execute(f"DELETE FROM industry_flows_monthly {where}", params)
+    con.execute("INSERT INTO industry_flows_monthly " + _MONTHLY_AGG_SQL.format(where=where),
+                params)
+
+
+def _monthly_source(con):
+    """
+    FROM clause for the monthly aggregate: the materialised table, or the same
+    aggregate over industry_flows on a DB the pipeline hasn't migrated yet
+    (the dashboard never runs init_db).
+    """
+    if con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                   "AND name = 'industry_flows_monthly'").fetchone():
+        return "industry_flows_monthly"
+    return f"({_MONTHLY_AGG_SQL.format(where='')})"
+
+
 # ─────────────────────────────────────────────
 # API
 # ─────────────────────────────────────────────
 
+def _api_cache_path(endpoint, payload):
+    """On-disk cache file for this request, or None if it must not be cached."""
+    report_date = payload.get("reportDate")
+    if not report_date:
+        return None
+    age = date.today() - datetime.strptime(report_date, "%d-%b-%Y").date()
+    if age.days < API_CACHE_MIN_AGE_DAYS:
+        return None
+    key = hashlib.sha1(json.dumps([endpoint, payload], sort_keys=True).encode()).hexdigest()
+    return os.path.join(API_CACHE_DIR, f"{key}.json.gz")
+
+
 def _api_post(endpoint, payload):
+    cache_path = _api_cache_path(endpoint, payload)
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with gzip.open(cache_path, "rt", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, EOFError, ValueError) as e:
+            # Truncated / corrupt file: drop it and refetch
+            log.warning("Discarding unreadable API cache file %s: %s", cache_path, e)
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+            cached = {}
+        # Files written before empty answers were excluded are refetched
+        if cached.get("data"):
+            return cached
+
     url = API_BASE + endpoint
     try:
-        resp = requests.post(url, headers=API_HEADERS, json=payload, timeout=60)
+        resp = _SESSION.post(url, json=payload, timeout=60)
         resp.raise_for_status()
         data = resp.json()
         if data.get("validationMsg") != "SUCCESS":
             return {}
-        return data
     except Exception as e:
         log.error("API call failed for %s: %s", endpoint, e)
         return {}
 
+    # Only cache answers with records: an empty SUCCESS may be a transient
+    # gap and must stay retryable (the _has_data probe relies on it)
+    if cache_path and data.get("data"):
+        # Write-then-rename so a concurrent or interrupted run never reads a partial file
+        os.makedirs(API_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, cache_path)
+    return data
+
+
+def _api_date(ts):
+    """Format a date as the API's 'dd-MMM-yyyy' (locale-independent)."""
+    return ts.strftime(f"%d-{MONTH_ABBR[ts.month]}-%Y")
 
+
+@lru_cache(maxsize=256)
 def get_last_business_day(year, month):
-    if month == 12:
-        last_day = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        last_day = date(year, month + 1, 1) - timedelta(days=1)
-    while last_day.weekday() >= 5:
-        last_day -= timedelta(days=1)
-    return last_day.strftime(f"%d-{MONTH_ABBR[last_day.month]}-%Y")
+    """Last weekday of the month as 'dd-MMM-yyyy'."""
+    return _api_date(pd.Timestamp(year, month, 1) + BMonthEnd(0))
+
+
+def previous_business_days(date_str, n=4):
+    """The `n` weekdays before `date_str`, newest first, as holiday fallbacks."""
+    start = pd.Timestamp(datetime.strptime(date_str, "%d-%b-%Y"))
+    return [_api_date(start - BDay(k)) for k in range(1, n + 1)]
+
+
+def _fundperformance_payload(cat_id, subcat_id, report_date):
+    return {
+        "maturityType": MATURITY_TYPE_OPEN,
+        "category": cat_id,
+        "subCategory": subcat_id,
+        "mfid": SYSTEM_MFID,
+        "reportDate": report_date,
+    }
 
 
 def fetch_all_system(report_date: str) -> pd.DataFrame:
@@ -210,76 +389,148 @@ def fetch_all_system(report_date: str) -> pd.DataFrame:
     Uses mfid=0 to get system-level data.
     Returns raw DataFrame with scheme_name, category, sub_category, navRegular, dailyAUM.
     """
-    all_rows = []
-
-    for cat_id, cat_name in CATEGORIES.items():
-        subcats = SUBCATEGORIES[cat_id]
-        for subcat_id, subcat_name in subcats.items():
-            log.info("  Fetching %s > %s for %s ...", cat_name, subcat_name, report_date)
-            payload = {
-                "maturityType": MATURITY_TYPE_OPEN,
-                "category": cat_id,
-                "subCategory": subcat_id,
-                "mfid": SYSTEM_MFID,
-                "reportDate": report_date,
-            }
-            result = _api_post("fundperformance", payload)
-            records = result.get("data", [])
-
-            for rec in records:
-                scheme = rec.get("schemeName", "")
-                nav = rec.get("navRegular")
-                aum = rec.get("dailyAUM")
-                if not scheme or not nav or not aum:
-                    continue
-
-                all_rows.append({
-                    "amc": extract_amc(scheme),
-                    "scheme_name": scheme,
-                    "category": cat_name,
-                    "sub_category": subcat_name,
-                    "nav_regular": nav,
-                    "daily_aum_cr": aum,
-                })
-
-            time.sleep(0.3)
-
-    df = pd.DataFrame(all_rows)
+    tasks = [(cat_id, cat_name, subcat_id, subcat_name)
+             for cat_id, cat_name in CATEGORIES.items()
+             for subcat_id, subcat_name in SUBCATEGORIES[cat_id].items()]
+
+    def fetch(task):
+        cat_id, cat_name, subcat_id, subcat_name = task
+        log.info("  Fetching %s > %s for %s ...", cat_name, subcat_name, report_date)
+        result = _api_post("fundperformance",
+                           _fundperformance_payload(cat_id, subcat_id, report_date))
+
+        # Keep records with a (non-zero) name, NAV and AUM
+        return [r for r in ((rec.get("schemeName"), rec.get("navRegular"), rec.get("dailyAUM"))
+                            for rec in result.get("data", []))
+                if all(r)]
+
+    # Sub-categories are independent requests; map() keeps them in task order
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as ex:
+        results = list(ex.map(fetch, tasks))
+
+    # A scheme listed more than once (e.g. under two sub-categories) is kept
+    # at its first listing in task order, so the frame is unique by name
+    seen = set()
+    rows, counts = [], []
+    for task_rows in results:
+        n_before = len(rows)
+        for row in task_rows:
+            if row[0] not in seen:
+                seen.add(row[0])
+                rows.append(row)
+        counts.append(len(rows) - n_before)
+    schemes, navs, aums = map(list, zip(*rows)) if rows else ([], [], [])
+
+    # Assemble column-wise; category / sub-category are constant per request.
+    # The low-cardinality name columns are categoricals from the start.
+    df = pd.DataFrame({
+        "amc": pd.Categorical([extract_amc(name) for name in schemes]),
+        "scheme_name": schemes,
+        "category": pd.Categorical(np.repeat([t[1] for t in tasks], counts)),
+        "sub_category": pd.Categorical(np.repeat([t[3] for t in tasks], counts)),
+        "nav_regular": np.array(navs, dtype=np.float64),
+        "daily_aum_cr": np.array(aums, dtype=np.float64),
+    })
     log.info("  Total schemes fetched for %s: %d", report_date, len(df))
     return df
 
 
-def _try_fetch(year, month):
-    """Try to fetch data for last business day of month, retrying earlier dates."""
-    report_date = get_last_business_day(year, month)
-    df = fetch_all_system(report_date)
+def _has_data(report_date):
+    """One-request probe (Equity > Large Cap) for whether `report_date` has been published."""
+    return bool(_api_post("fundperformance",
+                          _fundperformance_payload(1, 1, report_date)).get("data"))
 
-    if df.empty:
-        for offset in range(1, 5):
-            dt = datetime.strptime(report_date, "%d-%b-%Y") - timedelta(days=offset)
-            while dt.weekday() >= 5:
-                dt -= timedelta(days=1)
-            alt_date = dt.strftime(f"%d-{MONTH_ABBR[dt.month]}-%Y")
-            log.info("  Retrying with %s ...", alt_date)
-            df = fetch_all_system(alt_date)
-            if not df.empty:
-                report_date = alt_date
-                break
 
-    return df, report_date
+def _try_fetch(year, month):
+    """
+    Fetch data for the last business day of the month, falling back to earlier
+    weekdays (holidays). Candidate dates are probed with a single request, so
+    the full fan-out only runs for a date that has data.
+    """
+    report_date = get_last_business_day(year, month)
+    for candidate in [report_date, *previous_business_days(report_date)]:
+        if candidate != report_date:
+            log.info("  Retrying with %s ...", candidate)
+        if _has_data(candidate):
+            return fetch_all_system(candidate), candidate
+    return pd.DataFrame(), report_date
 
 
 # ─────────────────────────────────────────────
 # MAIN ENTRY POINT
 # ─────────────────────────────────────────────
 
-def compute_flows_for_month(year: int, month: int):
+def _month_stored(year: int, month: int) -> bool:
+    """True if industry_flows already holds rows for any date in the month."""
+    first = date(year, month, 1)
+    last = first + relativedelta(months=1, days=-1)
+    con = _connect()
+    try:
+        return con.execute(
+            "SELECT EXISTS(SELECT 1 FROM industry_flows WHERE month_end BETWEEN ? AND ?)",
+            (first.isoformat(), last.isoformat()),
+        ).fetchone()[0] == 1
+    finally:
+        con.close()
+
+
+_SNAPSHOT_COLS = ["amc", "scheme_name", "category", "sub_category",
+                  "nav_regular", "daily_aum_cr"]
+
+# Flows for every current scheme whose name also appears in the previous
+# snapshot. fetch_all_system returns each scheme once with non-zero NAV and
+# AUM, so the join is one-to-one and every flow is defined.
+_FLOW_SQL = """
+    INSERT INTO industry_flows
+        (amc, scheme_name, category, sub_category, month_end,
+         nav_cur, nav_prev, nav_return, aum_cur_cr, aum_prev_cr,
+         expected_aum_cr, net_flow_cr, flow_pct)
+    SELECT amc, scheme_name, category, sub_category, ?,
+           nav_cur, nav_prev, nav_return, aum_cur, aum_prev,
+           expected, aum_cur - expected, (aum_cur - expected) / aum_prev * 100
+    FROM (
+        SELECT c.rowid AS pos, c.amc, c.scheme_name, c.category, c.sub_category,
+               c.nav_regular AS nav_cur, p.nav_regular AS nav_prev,
+               c.nav_regular / p.nav_regular AS nav_return,
+               c.daily_aum_cr AS aum_cur, p.daily_aum_cr AS aum_prev,
+               p.daily_aum_cr * (c.nav_regular / p.nav_regular) AS expected
+        FROM cur_raw c
+        JOIN prev_raw p ON p.scheme_name = c.scheme_name
+    )
+    ORDER BY pos
+"""
+
+
+def _stage_snapshot(con, table, df):
+    """Load one fetched snapshot into a connection-local temp table."""
+    con.execute(f"""
+        CREATE TEMP TABLE {table} (
+            amc TEXT, scheme_name TEXT, category TEXT, sub_category TEXT,
+            nav_regular REAL, daily_aum_cr REAL
+        )
+    """)
+    snap = df[_SNAPSHOT_COLS]
+    con.executemany(
+        f"INSERT INTO {table} VALUES ({', '.join('?' * len(_SNAPSHOT_COLS))})",
+        snap.astype(object).where(snap.notna(), None).itertuples(index=False, name=None),
+    )
+
+
+def compute_flows_for_month(year: int, month: int, analyze: bool = True,
+                            force: bool = False):
     """
     Fetch current + previous month data for ALL AMCs, merge, compute flows.
     Same two-month approach as the ICICI pipeline but using mfid=0.
+    Months already in the DB are skipped unless force=True.
+    Pass analyze=False when loading many months; call analyze_db() once after.
     """
     init_db()
 
+    if not force and _month_stored(year, month):
+        log.info("Industry flows for %s-%d already stored; skipping (use --force to refetch)",
+                 MONTH_ABBR[month], year)
+        return
+
     prev = date(year, month, 1) - relativedelta(months=1)
 
     log.info("=" * 60)
@@ -307,64 +558,58 @@ def compute_flows_for_month(year: int, month: int):
     cur_date_iso = datetime.strptime(cur_date_str, "%d-%b-%Y").strftime("%Y-%m-%d")
     prev_date_iso = datetime.strptime(prev_date_str, "%d-%b-%Y").strftime("%Y-%m-%d")
 
-    # Merge on scheme_name
-    merged = df_cur.merge(
-        df_prev[["scheme_name", "nav_regular", "daily_aum_cr"]],
-        on="scheme_name",
-        how="inner",
-        suffixes=("_cur", "_prev"),
-    )
-
-    if merged.empty:
+    # Stage both snapshots and let SQLite match schemes and compute the flows
+    con = _connect()
+    try:
+        _stage_snapshot(con, "cur_raw", df_cur)
+        _stage_snapshot(con, "prev_raw", df_prev)
+        matched = con.execute(
+            "SELECT EXISTS(SELECT 1 FROM cur_raw JOIN prev_raw USING (scheme_name))"
+        ).fetchone()[0]
+        if matched:
+            # Replace the month and refresh its aggregate in one transaction
+            with con:
+                con.execute("DELETE FROM industry_flows WHERE month_end = ?", (cur_date_iso,))
+                con.execute(_FLOW_SQL, (cur_date_iso,))
+                refresh_monthly_agg(con, cur_date_iso)
+            if analyze:
+                # Refresh planner statistics so month-range reads use the indexes
+                con.execute("ANALYZE")
+            n_flows, n_amc, total_flow, total_aum = con.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT amc), SUM(net_flow_cr), SUM(aum_cur_cr) "
+                "FROM industry_flows WHERE month_end = ?",
+                (cur_date_iso,),
+            ).fetchone()
+    finally:
+        con.close()
+
+    if not matched:
         msg = "No matching schemes between months"
         log.error(msg)
         _log_run(cur_date_iso, 0, "FAILED", msg)
         return
 
-    # Compute flows
-    merged["nav_return"] = merged["nav_regular_cur"] / merged["nav_regular_prev"]
-    merged["expected_aum_cr"] = merged["daily_aum_cr_prev"] * merged["nav_return"]
-    merged["net_flow_cr"] = merged["daily_aum_cr_cur"] - merged["expected_aum_cr"]
-    merged["flow_pct"] = (merged["net_flow_cr"] / merged["daily_aum_cr_prev"]) * 100
-
-    # Build flow records
-    flow_df = merged.rename(columns={
-        "nav_regular_cur": "nav_cur",
-        "nav_regular_prev": "nav_prev",
-        "daily_aum_cr_cur": "aum_cur_cr",
-        "daily_aum_cr_prev": "aum_prev_cr",
-    })[["amc", "scheme_name", "category", "sub_category",
-        "nav_cur", "nav_prev", "nav_return",
-        "aum_cur_cr", "aum_prev_cr", "expected_aum_cr",
-        "net_flow_cr", "flow_pct"]].copy()
-
-    flow_df = flow_df.dropna(subset=["net_flow_cr"])
-    flow_df = flow_df.drop_duplicates(subset=["amc", "scheme_name"], keep="first")
-    flow_df["month_end"] = cur_date_iso
-
-    # Store
-    con = sqlite3.connect(DB_PATH)
-    con.execute("DELETE FROM industry_flows WHERE month_end = ?", (cur_date_iso,))
-    con.commit()
-    flow_df.to_sql("industry_flows", con, if_exists="append", index=False)
-    con.commit()
-    con.close()
-
-    total_flow = flow_df["net_flow_cr"].sum()
-    total_aum = flow_df["aum_cur_cr"].sum()
-    n_amc = flow_df["amc"].nunique()
     log.info("=" * 60)
-    log.info("Stored %d flow records for %s", len(flow_df), cur_date_iso)
+    log.info("Stored %d flow records for %s", n_flows, cur_date_iso)
     log.info("  AMCs:           %d", n_amc)
-    log.info("  Total Net Flow: Rs %.0f Cr", total_flow)
-    log.info("  Total AUM:      Rs %.0f Cr", total_aum)
+    log.info("  Total Net Flow: Rs %.0f Cr", total_flow or 0)
+    log.info("  Total AUM:      Rs %.0f Cr", total_aum or 0)
     log.info("=" * 60)
 
-    _log_run(cur_date_iso, len(flow_df), "SUCCESS", f"{n_amc} AMCs, {len(flow_df)} schemes")
+    _log_run(cur_date_iso, n_flows, "SUCCESS", f"{n_amc} AMCs, {n_flows} schemes")
+
+
+def analyze_db():
+    """Refresh planner statistics after a bulk load."""
+    con = _connect()
+    try:
+        con.execute("ANALYZE")
+    finally:
+        con.close()
 
 
 def _log_run(month_end, count, status, message):
-    con = sqlite3.connect(DB_PATH)
+    con = _connect()
     con.execute(
         "INSERT INTO pipeline_log (run_at, month_processed, schemes_updated, status, message) VALUES (?,?,?,?,?)",
         (datetime.utcnow().isoformat(), month_end, count, status, message),
@@ -377,18 +622,94 @@ def _log_run(month_end, count, status, message):
 # QUERY HELPERS
 # ─────────────────────────────────────────────
 
-def load_flows(months=36):
-    con = sqlite3.connect(DB_PATH)
-    df = pd.read_sql(
-        f"SELECT * FROM industry_flows WHERE month_end >= date('now', '-{months} months') ORDER BY month_end DESC",
-        con,
-    )
+# Typed straight out of read_sql, so the dashboard doesn't convert after loading
+NAME_DTYPES = {c: "category" for c in ("amc", "category", "sub_category")}
+
+
+def load_flows(months=36, categories=None):
+    """Last `months` of industry_flows, optionally limited to the given categories."""
+    q = "SELECT * FROM industry_flows WHERE month_end >= date('now', ?)"
+    params = [f"-{months} months"]
+    if categories is not None:
+        q += f" AND category IN ({', '.join('?' * len(categories))})"
+        params += list(categories)
+    con = _connect()
+    df = pd.read_sql(q + " ORDER BY month_end DESC", con, params=params,
+                     parse_dates=["month_end"], dtype={**NAME_DTYPES, "scheme_name": "category"})
+    con.close()
+    return df
+
+
+def load_monthly_agg(months=36, categories=None, amc=None):
+    """industry_flows_monthly counterpart of load_flows (one row per AMC x sub-category x month)."""
+    con = _connect()
+    q = f"SELECT * FROM {_monthly_source(con)} WHERE month_end >= date('now', ?)"
+    params = [f"-{months} months"]
+    if amc is not None:
+        q += " AND amc = ?"
+        params.append(amc)
+    if categories is not None:
+        q += f" AND category IN ({', '.join('?' * len(categories))})"
+        params += list(categories)
+    df = pd.read_sql(q + " ORDER BY month_end DESC", con, params=params,
+                     parse_dates=["month_end"], dtype=NAME_DTYPES)
+    con.close()
+    return df
+
+
+def load_top_flows(amc, month_ends, n=10, largest=True, sub_category=None, categories=None):
+    """
+    One AMC's top `n` inflow (largest) or outflow schemes by net flow summed
+    over `month_ends`, ranked and limited in SQLite.
+    """
+    q = f"""
+        SELECT scheme_name, SUM(net_flow_cr) AS net_flow_cr
+        FROM industry_flows
+        WHERE amc = ? AND month_end IN ({', '.join('?' * len(month_ends))})
+    """
+    params = [amc, *month_ends]
+    if sub_category is not None:
+        q += " AND sub_category = ?"
+        params.append(sub_category)
+    if categories is not None:
+        q += f" AND category IN ({', '.join('?' * len(categories))})"
+        params += list(categories)
+    q += f"""
+        GROUP BY scheme_name
+        HAVING SUM(net_flow_cr) {'>' if largest else '<'} 0
+        ORDER BY net_flow_cr {'DESC' if largest else 'ASC'}
+        LIMIT ?
+    """
+    params.append(n)
+    con = _connect()
+    df = pd.read_sql(q, con, params=params)
+    con.close()
+    return df
+
+
+def load_amc_category_flows(amc, month_ends, categories=None):
+    """
+    One AMC's net flow per sub-category summed over `month_ends`, smallest
+    first, read from the industry_flows_monthly pre-aggregate.
+    """
+    con = _connect()
+    q = f"""
+        SELECT sub_category, SUM(net_flow_cr) AS net_flow
+        FROM {_monthly_source(con)}
+        WHERE amc = ? AND month_end IN ({', '.join('?' * len(month_ends))})
+    """
+    params = [amc, *month_ends]
+    if categories is not None:
+        q += f" AND category IN ({', '.join('?' * len(categories))})"
+        params += list(categories)
+    q += " GROUP BY sub_category ORDER BY net_flow"
+    df = pd.read_sql(q, con, params=params)
     con.close()
     return df
 
 
 def load_pipeline_log():
-    con = sqlite3.connect(DB_PATH)
+    con = _connect()
     df = pd.read_sql("SELECT * FROM pipeline_log ORDER BY run_at DESC LIMIT 30", con)
     con.close()
     return df
@@ -405,6 +726,8 @@ if __name__ == "__main__":
     parser.add_argument("--year", type=int)
     parser.add_argument("--month", type=int)
     parser.add_argument("--backfill", type=int, default=0)
+    parser.add_argument("--force", action="store_true",
+                        help="refetch months that are already stored")
     args = parser.parse_args()
 
     if args.year and args.month:
@@ -421,8 +744,11 @@ if __name__ == "__main__":
             months_to_process.append((dt.year, dt.month))
 
         log.info("Backfilling %d months", len(months_to_process))
-        for yr, mn in months_to_process:
-            compute_flows_for_month(yr, mn)
-            time.sleep(1)
+        init_db()
+        with ThreadPoolExecutor(max_workers=BACKFILL_WORKERS) as ex:
+            list(ex.map(lambda ym: compute_flows_for_month(*ym, analyze=False,
+                                                           force=args.force),
+                        months_to_process))
+        analyze_db()
     else:
-        compute_flows_for_month(target_year, target_month)
+        compute_flows_for_month(target_year, target_month, force=args.force)
@@ -1,18 +1,22 @@
 """
-Monthly scheduler — runs the pipeline automatically around the 12th of each month
+Monthly job — runs the pipeline once for the previous month and exits
 (AMFI typically publishes monthly AUM data by the 10th).
 
-Run this as a persistent background process:
-    python scheduler.py
+Meant to be fired by the OS scheduler around the 12th of each month rather than
+kept resident. With systemd, install deploy/mf-flows.service and
+deploy/mf-flows.timer:
+    systemctl enable --now mf-flows.timer
 
-Or use cron:
-    0 9 12 * * /path/to/venv/bin/python /path/to/mf_flows/scheduler.py
+Or use cron (09:30 IST on the 12th; CRON_TZ needs cronie or similar, otherwise
+convert the time to the server's zone):
+    CRON_TZ=Asia/Kolkata
+    30 9 12 * * /path/to/venv/bin/python /path/to/mf_flows/scheduler.py
 """
 
 import logging
+import sys
 from datetime import date
 from dateutil.relativedelta import relativedelta
-from apscheduler.schedulers.blocking import BlockingScheduler
 import pipeline as pl
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
@@ -21,30 +25,23 @@ log = logging.getLogger(__name__)
 
 def monthly_job():
     """
-    Runs on the 12th of each month at 9:30 AM IST.
     Processes the previous month's data (which AMFI would have published by now).
+    Returns True only if flows were stored, so the caller can set the exit status.
     """
     today = date.today()
     target = date(today.year, today.month, 1) - relativedelta(months=1)
     log.info("Scheduler triggered: processing %s/%s", target.month, target.year)
     try:
-        pl.compute_flows_for_month(target.year, target.month)
+        if not pl.compute_flows_for_month(target.year, target.month):
+            log.error("Pipeline run FAILED (see pipeline_log).")
+            return False
         log.info("Pipeline completed successfully.")
+        return True
     except Exception as e:
         log.error("Pipeline failed: %s", e, exc_info=True)
+        return False
 
 
 if __name__ == "__main__":
     pl.init_db()
-    scheduler = BlockingScheduler(timezone="Asia/Kolkata")
-
-    # Run on 12th of every month at 09:30 AM IST
-    scheduler.add_job(monthly_job, "cron", day=12, hour=9, minute=30)
-
-    log.info("Scheduler started. Will run on 12th of each month at 09:30 IST.")
-    log.info("Press Ctrl+C to exit.")
-
-    try:
-        scheduler.start()
-    except (KeyboardInterrupt, SystemExit):
-        log.info("Scheduler stopped.")
+    sys.exit(0 if monthly_job() else 1)